@@ -0,0 +1,76 @@
+"""Сравнение скорости рендеринга notes/list.html движками Django и Jinja2.
+
+Запуск: python -m benchmarks.rendering [--items 10000] [--runs 5]
+"""
+import argparse
+import os
+import time
+
+import django
+
+
+def build_engines():
+    from django.conf import settings
+    from django.utils.module_loading import import_string
+
+    engines = {}
+    for name, config in (
+        ('django', settings.DJANGO_TEMPLATES),
+        ('jinja2', settings.JINJA2_TEMPLATES),
+    ):
+        params = dict(config, NAME=name)
+        engines[name] = import_string(params.pop('BACKEND'))(params)
+    return engines
+
+
+def build_context(items):
+    from django.contrib.auth.models import AnonymousUser
+
+    from notes.forms import NoteBulkForm, NoteImportForm
+    from notes.models import Note
+
+    return {
+        'user': AnonymousUser(),
+        'messages': [],
+        'object_list': [
+            Note(id=number, title=f'Заметка {number}', slug=f'note-{number}')
+            for number in range(1, items + 1)
+        ],
+        'tags': [],
+        'selected_tags': [],
+        'tag_query': '',
+        'bulk_form': NoteBulkForm(),
+        'import_form': NoteImportForm(),
+    }
+
+
+def measure(engine, context, runs):
+    """Лучшее время рендеринга из runs попыток, с."""
+    template = engine.get_template('notes/list.html')
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        template.render(context)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--items', type=int, default=10_000)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yanote.settings')
+    django.setup()
+    context = build_context(args.items)
+    results = {
+        name: measure(engine, context, args.runs)
+        for name, engine in build_engines().items()
+    }
+    for name, seconds in results.items():
+        print(f'{name}: {seconds * 1000:.1f} мс на {args.items} заметок')
+    print(f'ускорение: {results["django"] / results["jinja2"]:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""Замер холодного старта manage.py, yanote.wsgi и yanote.asgi.
+
+Каждая цель запускается в новом интерпретаторе с ``-X importtime``:
+печатается общее время до готовности приложения, время заполнения
+реестра приложений и самые дорогие импорты.
+
+    python -m benchmarks.startup [--runs 5] [--top 15]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+TARGETS = {
+    'manage': 'import manage, django; django.setup()',
+    'wsgi': 'import yanote.wsgi',
+    'asgi': 'import yanote.asgi',
+}
+
+PROBE = '''
+import json, sys, time
+started = time.perf_counter()
+import django
+from django.apps import apps
+from django.conf import settings
+settings.INSTALLED_APPS
+configured = time.perf_counter()
+django.setup()
+registry = time.perf_counter() - configured
+{code}
+print(json.dumps({{
+    'total': time.perf_counter() - started,
+    'registry': registry,
+    'ready': apps.ready,
+    'modules': sorted(sys.modules),
+}}))
+'''
+
+
+def measure(target, importtime=False):
+    """Запускает цель в новом процессе и возвращает результаты замера."""
+    command = [sys.executable]
+    if importtime:
+        command += ['-X', 'importtime']
+    command += ['-c', PROBE.format(code=TARGETS[target])]
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE='yanote.settings')
+    completed = subprocess.run(
+        command, cwd=BASE_DIR, env=env, capture_output=True, text=True,
+        check=True,
+    )
+    result = json.loads(completed.stdout.splitlines()[-1])
+    if importtime:
+        result['imports'] = parse_importtime(completed.stderr)
+    return result
+
+
+def parse_importtime(stderr):
+    """Собственное и накопленное время импорта модулей, мкс."""
+    imports = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        imports[name.strip()] = (int(own), int(cumulative))
+    return imports
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15)
+    args = parser.parse_args()
+    for target in TARGETS:
+        runs = [measure(target) for _ in range(args.runs)]
+        total = statistics.median(run['total'] for run in runs)
+        registry = statistics.median(run['registry'] for run in runs)
+        print(
+            f'{target}: старт {total * 1000:.0f} мс, '
+            f'реестр приложений {registry * 1000:.0f} мс'
+        )
+        imports = measure(target, importtime=True)['imports']
+        top = sorted(imports.items(), key=lambda item: -item[1][0])
+        for name, (own, cumulative) in top[:args.top]:
+            print(
+                f'  {own / 1000:7.1f} мс  {cumulative / 1000:7.1f} мс  {name}'
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,117 @@
 from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.contrib.auth.admin import UserAdmin
 
-from .models import Note
+from . import jobs
+from .models import Job, Note, Tag
+from .paginators import EstimatedCountPaginator
 
-admin.site.register(Note)
+User = get_user_model()
+
+
+@admin.register(Note)
+class NoteAdmin(admin.ModelAdmin):
+    """Админка заметок, рассчитанная на большие таблицы."""
+
+    list_display = ('title', 'slug', 'author', 'deleted_at')
+    list_filter = (('deleted_at', admin.EmptyFieldListFilter),)
+    list_select_related = ('author',)
+    raw_id_fields = ('author',)
+    search_fields = ('slug__exact', 'author__username__exact')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    actions = ('trash_notes', 'restore_notes', 'clear_tags')
+
+    def get_queryset(self, request):
+        """Показывает и заметки из корзины."""
+        return Note.all_objects.all()
+
+    def get_actions(self, request):
+        """Убирает стандартное удаление, загружающее все объекты."""
+        actions = super().get_actions(request)
+        actions.pop('delete_selected', None)
+        return actions
+
+    @admin.action(
+        description='Переместить выбранные заметки в корзину',
+        permissions=('delete',),
+    )
+    def trash_notes(self, request, queryset):
+        """Переносит заметки в корзину одним UPDATE.
+
+        Окончательно их удалит purge_trash по истечении срока хранения,
+        как и заметки, удалённые пользователями.
+        """
+        trashed = queryset.soft_delete()
+        self.message_user(request, f'Перемещено в корзину: {trashed}')
+
+    @admin.action(
+        description='Вернуть выбранные заметки из корзины',
+        permissions=('change',),
+    )
+    def restore_notes(self, request, queryset):
+        restored = queryset.restore()
+        self.message_user(request, f'Восстановлено заметок: {restored}')
+
+    @admin.action(
+        description='Снять все теги с выбранных заметок',
+        permissions=('change',),
+    )
+    def clear_tags(self, request, queryset):
+        queryset.clear_tags()
+        self.message_user(request, 'Теги сняты')
+
+
+@admin.register(Tag)
+class TagAdmin(admin.ModelAdmin):
+    list_display = ('name', 'author', 'notes_count')
+    list_select_related = ('author',)
+    raw_id_fields = ('author',)
+    search_fields = ('name__exact', 'author__username__exact')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = (
+        'pk', 'kind', 'status', 'attempts', 'progress_done', 'progress_total',
+        'run_after', 'updated_at',
+    )
+    list_filter = ('status', 'kind')
+    raw_id_fields = ('author',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+class NoteStatsUserAdmin(UserAdmin):
+    """Пользователи со статистикой заметок из денормализованной таблицы."""
+
+    list_display = UserAdmin.list_display + (
+        'note_stats__notes_count',
+        'note_stats__chars_count',
+        'note_stats__last_edited_at',
+    )
+    list_select_related = ('note_stats',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def delete_model(self, request, obj):
+        """Отключает пользователя, а удаляет его фоновая задача.
+
+        Представление удаления админки выполняется в одной транзакции,
+        поэтому пачки purge_author здесь не были бы короткими.
+        """
+        self.delete_queryset(request, User.objects.filter(pk=obj.pk))
+
+    def delete_queryset(self, request, queryset):
+        user_ids = list(queryset.values_list('pk', flat=True))
+        User.objects.filter(pk__in=user_ids).update(is_active=False)
+        jobs.enqueue('delete_users', user_ids=user_ids)
+        self.message_user(
+            request, 'Пользователи отключены, удаление поставлено в очередь'
+        )
+
+
+admin.site.unregister(User)
+admin.site.register(User, NoteStatsUserAdmin)
@@ -0,0 +1,177 @@
+"""Хранение вложений: докачиваемые загрузки и отдача по диапазонам.
+
+Части загрузки пишутся прямо в файл на диске по смещению из запроса,
+не собираясь в памяти. Готовый файл кладётся по своему SHA-256, поэтому
+одинаковые вложения хранятся один раз.
+
+Файлы без вложений и брошенные загрузки убирает команда
+clean_attachments (или фоновая задача с тем же именем); её запускают
+по расписанию вместе с purge_trash.
+"""
+import hashlib
+import os
+import re
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import ProtectedError
+from django.utils import timezone
+
+from .models import Attachment, Blob, Upload
+
+CHUNK_SIZE = 64 * 1024
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class UploadError(Exception):
+    """Часть загрузки не принята; offset — сколько байт уже получено."""
+
+    def __init__(self, message, offset):
+        super().__init__(message)
+        self.offset = offset
+
+
+def write_chunk(upload, offset, stream, length):
+    """Пишет length байт из stream в файл загрузки начиная с offset.
+
+    Повтор уже записанной части безопасен: данные ложатся на то же место.
+    Возвращает новое количество полученных байт.
+    """
+    if offset > upload.received:
+        raise UploadError('Пропущена часть файла', upload.received)
+    if offset + length > upload.size:
+        raise UploadError('Часть выходит за размер файла', upload.received)
+    upload.path.parent.mkdir(parents=True, exist_ok=True)
+    descriptor = os.open(upload.path, os.O_WRONLY | os.O_CREAT, 0o600)
+    with os.fdopen(descriptor, 'wb') as part:
+        part.seek(offset)
+        remaining = length
+        while remaining:
+            data = stream.read(min(CHUNK_SIZE, remaining))
+            if not data:
+                raise UploadError('Часть получена не полностью', offset)
+            part.write(data)
+            remaining -= len(data)
+    received = max(upload.received, offset + length)
+    Upload.objects.filter(pk=upload.pk, received__lt=received).update(
+        received=received
+    )
+    upload.received = received
+    return received
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as source:
+        for data in iter(lambda: source.read(CHUNK_SIZE), b''):
+            digest.update(data)
+    return digest.hexdigest()
+
+
+def complete(upload):
+    """Превращает полностью полученную загрузку во вложение."""
+    sha256 = file_sha256(upload.path)
+    blob = Blob.objects.filter(sha256=sha256).first()
+    if blob is None:
+        blob = Blob(sha256=sha256, size=upload.size)
+        blob.path.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(upload.path, blob.path)
+        try:
+            with transaction.atomic():
+                blob.save()
+        except IntegrityError:
+            blob = Blob.objects.get(sha256=sha256)
+    else:
+        upload.path.unlink(missing_ok=True)
+    with transaction.atomic():
+        attachment = Attachment.objects.create(
+            note=upload.note,
+            blob=blob,
+            name=upload.name,
+            content_type=upload.content_type,
+        )
+        upload.delete()
+    return attachment
+
+
+def parse_range(header, size):
+    """Диапазон из заголовка Range как (начало, конец включительно).
+
+    None — заголовка нет или он не поддерживается (несколько диапазонов),
+    и файл отдаётся целиком; ValueError — диапазон невыполним.
+    """
+    match = RANGE_RE.match(header.strip()) if header else None
+    if match is None:
+        return None
+    start, end = match.groups()
+    if not start and not end:
+        return None
+    if not start:
+        start, end = max(size - int(end), 0), size - 1
+    else:
+        start = int(start)
+        end = min(int(end), size - 1) if end else size - 1
+    if start > end or start >= size:
+        raise ValueError(header)
+    return start, end
+
+
+class FileRange:
+    """Файл, из которого читается только байтовый диапазон."""
+
+    def __init__(self, file, start, length):
+        file.seek(start)
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def delete_orphan_blobs():
+    """Удаляет файлы, на которые не ссылается ни одно вложение.
+
+    Файл сначала переименовывается и только потом удаляется строка:
+    если complete() не найдёт строку и положит новую загрузку с тем же
+    хешем на прежнее место, удаление её уже не заденет.
+    """
+    deleted = 0
+    for blob in Blob.objects.filter(attachment__isnull=True).iterator():
+        aside = blob.path.with_name(blob.path.name + '.deleting')
+        try:
+            os.replace(blob.path, aside)
+        except FileNotFoundError:
+            aside = None
+        try:
+            blob.delete()
+        except ProtectedError:
+            # Файл успели прикрепить заново.
+            if aside is not None:
+                os.replace(aside, blob.path)
+            continue
+        if aside is not None:
+            aside.unlink()
+        deleted += 1
+    return deleted
+
+
+def delete_stale_uploads(days=None, now=None):
+    """Удаляет загрузки, не завершённые за days дней, вместе с файлами."""
+    if days is None:
+        days = settings.NOTES_UPLOAD_EXPIRE_DAYS
+    cutoff = (now or timezone.now()) - timedelta(days=days)
+    deleted = 0
+    for upload in Upload.objects.filter(created_at__lt=cutoff).iterator():
+        path = upload.path
+        upload.delete()
+        path.unlink(missing_ok=True)
+        deleted += 1
+    return deleted
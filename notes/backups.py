@@ -0,0 +1,322 @@
+"""Резервные копии базы заметок и логический экспорт по авторам.
+
+Полная копия снимается онлайн-API резервного копирования SQLite: страницы
+базы копируются небольшими порциями с паузами, поэтому пишущие запросы
+приложения ждут не дольше одного шага. Копия сначала пишется во
+временный файл и только потом переименовывается, так что в каталоге
+резервных копий не бывает недописанных файлов.
+"""
+import json
+import os
+import sqlite3
+import time
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.utils import timezone
+
+from .forms import TAG_SEPARATOR, parse_tags
+from .models import Note, NoteTag, Tag
+
+BACKUP_PAGES = 256
+BACKUP_SLEEP = 0.05
+BACKUP_PATTERN = 'notes-*.sqlite3'
+EXPORT_CHUNK_SIZE = 500
+
+User = get_user_model()
+
+
+class BackupError(Exception):
+    """Резервную копию нельзя снять или она повреждена."""
+
+
+def backup_name(now=None):
+    now = timezone.localtime(now)
+    return f'notes-{now:%Y%m%d-%H%M%S}.sqlite3'
+
+
+def backup(path, pages=BACKUP_PAGES, sleep=BACKUP_SLEEP, progress=None,
+           using=DEFAULT_DB_ALIAS):
+    """Копирует живую базу в path порциями по pages страниц.
+
+    Между порциями выдерживается пауза sleep секунд: база в это время
+    не заблокирована, и запись приложения проходит без ожидания.
+    progress(remaining, total) вызывается после каждой порции.
+    """
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        raise BackupError('Онлайн-копирование поддерживается только SQLite')
+    if connection.in_atomic_block:
+        # Собственная незавершённая запись не даст копии продвинуться.
+        raise BackupError('Копию нельзя снимать внутри транзакции')
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary = path.with_name(path.name + '.part')
+    connection.ensure_connection()
+    target = sqlite3.connect(temporary)
+
+    def report(status, remaining, total):
+        if progress is not None:
+            progress(remaining, total)
+        # Сам sqlite3 спит только при SQLITE_BUSY/SQLITE_LOCKED.
+        if remaining and sleep:
+            time.sleep(sleep)
+
+    try:
+        connection.connection.backup(
+            target, pages=pages, sleep=sleep, progress=report
+        )
+    except BaseException:
+        target.close()
+        temporary.unlink(missing_ok=True)
+        raise
+    target.close()
+    os.replace(temporary, path)
+    return path
+
+
+def verify(path):
+    """Проверяет целостность копии и возвращает число заметок и пользователей.
+
+    Файл открывается только на чтение, чтобы проверка ничего в нём
+    не меняла.
+    """
+    path = Path(path).resolve()
+    if not path.is_file():
+        raise BackupError(f'Файл {path} не найден')
+    source = sqlite3.connect(f'{path.as_uri()}?mode=ro', uri=True)
+    try:
+        problems = [row[0] for row in source.execute('PRAGMA integrity_check')]
+        if problems != ['ok']:
+            raise BackupError('; '.join(problems))
+        return {
+            model._meta.label: source.execute(
+                f'SELECT COUNT(*) FROM "{model._meta.db_table}"'
+            ).fetchone()[0]
+            for model in (Note, User)
+        }
+    except sqlite3.DatabaseError as error:
+        raise BackupError(str(error)) from error
+    finally:
+        source.close()
+
+
+def rotate(directory, keep):
+    """Удаляет самые старые полные копии, оставляя keep последних."""
+    backups = sorted(Path(directory).glob(BACKUP_PATTERN), reverse=True)
+    for path in backups[keep:]:
+        path.unlink(missing_ok=True)
+    return backups[keep:]
+
+
+def note_record(note, tags):
+    return {
+        'slug': note.slug,
+        'title': note.title,
+        'text': note.text,
+        'tags': sorted(tags),
+    }
+
+
+def export_lines(notes):
+    """Строки JSONL с заметками набора, по одной на заметку.
+
+    Заметки читаются пачками, поэтому большой экспорт не загружает
+    все заметки в память.
+    """
+    notes = notes.order_by('pk').only(
+        'slug', 'title', 'text'
+    ).prefetch_related('tags')
+    for note in notes.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        record = note_record(note, (tag.name for tag in note.tags.all()))
+        yield json.dumps(record, ensure_ascii=False) + '\n'
+
+
+def export_author(user, stream):
+    """Пишет заметки автора в stream построчно в JSON. Возвращает их число."""
+    exported = 0
+    for line in export_lines(Note.objects.filter(author=user)):
+        stream.write(line)
+        exported += 1
+    return exported
+
+
+def export_path(job_pk):
+    """Файл выгрузки, подготовленной фоновой задачей job_pk."""
+    return Path(settings.NOTES_EXPORT_DIR) / f'export-{job_pk}.jsonl'
+
+
+def write_export(notes, path, progress=None):
+    """Пишет заметки набора в файл экспорта. Возвращает их число.
+
+    Файл сначала пишется рядом с расширением .part, поэтому по пути
+    path всегда лежит только законченная выгрузка. progress(done)
+    вызывается после каждых EXPORT_CHUNK_SIZE заметок.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary = path.with_name(path.name + '.part')
+    exported = 0
+    try:
+        with open(temporary, 'w', encoding='utf-8') as stream:
+            for line in export_lines(notes):
+                stream.write(line)
+                exported += 1
+                if progress is not None and not (
+                    exported % EXPORT_CHUNK_SIZE
+                ):
+                    progress(exported)
+    except BaseException:
+        temporary.unlink(missing_ok=True)
+        raise
+    os.replace(temporary, path)
+    return exported
+
+
+def save_import(uploaded):
+    """Сохраняет загруженный файл экспорта для фоновой задачи импорта."""
+    path = Path(settings.NOTES_EXPORT_DIR) / 'imports' / (
+        f'{uuid.uuid4()}.jsonl'
+    )
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'wb') as target:
+        for chunk in uploaded.chunks():
+            target.write(chunk)
+    return path
+
+
+def read_export(path):
+    """Читает записи заметок из файла экспорта."""
+    with open(path, encoding='utf-8') as source:
+        for line in source:
+            if line.strip():
+                yield json.loads(line)
+
+
+def read_backup(path, username):
+    """Читает заметки одного пользователя из полной резервной копии."""
+    path = Path(path).resolve()
+    source = sqlite3.connect(f'{path.as_uri()}?mode=ro', uri=True)
+    try:
+        columns = {
+            row[1] for row in source.execute(
+                f'PRAGMA table_info("{Note._meta.db_table}")'
+            )
+        }
+        # В копиях, снятых до появления корзины, колонки deleted_at нет.
+        alive = 'AND n.deleted_at IS NULL ' if 'deleted_at' in columns else ''
+        notes = source.execute(
+            f'SELECT n.id, n.slug, n.title, n.text '
+            f'FROM "{Note._meta.db_table}" n '
+            f'JOIN "{User._meta.db_table}" u ON u.id = n.author_id '
+            f'WHERE u.username = ? {alive}ORDER BY n.id',
+            (username,),
+        ).fetchall()
+        tags = {}
+        for note_id, name in source.execute(
+            f'SELECT nt.note_id, t.name '
+            f'FROM "{NoteTag._meta.db_table}" nt '
+            f'JOIN "{Tag._meta.db_table}" t ON t.id = nt.tag_id '
+            f'JOIN "{Note._meta.db_table}" n ON n.id = nt.note_id '
+            f'JOIN "{User._meta.db_table}" u ON u.id = n.author_id '
+            f'WHERE u.username = ?',
+            (username,),
+        ):
+            tags.setdefault(note_id, []).append(name)
+    except sqlite3.DatabaseError as error:
+        raise BackupError(str(error)) from error
+    finally:
+        source.close()
+    return [
+        {'slug': slug, 'title': title, 'text': text,
+         'tags': sorted(tags.get(note_id, ()))}
+        for note_id, slug, title, text in notes
+    ]
+
+
+def clean_record(record):
+    """Проверяет запись заметки так же, как поля формы.
+
+    Возвращает запись с очищенными значениями; при ошибке выбрасывает
+    ValidationError.
+    """
+    if not isinstance(record, dict):
+        raise ValidationError('Запись заметки должна быть объектом')
+    cleaned = {}
+    for name in ('slug', 'title', 'text'):
+        value = record.get(name)
+        if not isinstance(value, str):
+            raise ValidationError(f'Нет поля {name}')
+        cleaned[name] = Note._meta.get_field(name).clean(value, None)
+    if not cleaned['slug']:
+        raise ValidationError('Пустой slug')
+    tags = record.get('tags', [])
+    if not isinstance(tags, list) or not all(
+        isinstance(name, str) for name in tags
+    ):
+        raise ValidationError('Теги должны быть списком строк')
+    cleaned['tags'] = parse_tags(TAG_SEPARATOR.join(tags))
+    return cleaned
+
+
+def restore_author(user, records, replace=False):
+    """Восстанавливает заметки пользователя в живой базе.
+
+    Заметки сопоставляются по slug: отсутствующие создаются, свои
+    изменённые — перезаписываются, свои из корзины — возвращаются.
+    Заметки с slug, который уже занят другим автором, и записи, не
+    прошедшие clean_record, пропускаются. С replace=True заметки
+    пользователя, которых нет в records, переносятся в корзину. Всё
+    выполняется в одной транзакции, так что при ошибке база остаётся
+    прежней.
+    """
+    valid, invalid = {}, []
+    for record in records:
+        try:
+            cleaned = clean_record(record)
+        except ValidationError:
+            slug = record.get('slug') if isinstance(record, dict) else None
+            invalid.append(slug if isinstance(slug, str) else '')
+            continue
+        valid[cleaned['slug']] = cleaned
+    records = valid
+    result = {'created': 0, 'updated': 0, 'deleted': 0, 'skipped': []}
+    with transaction.atomic():
+        owners = dict(
+            Note.all_objects.filter(slug__in=records).values_list(
+                'slug', 'author_id'
+            )
+        )
+        result['skipped'] = sorted(invalid + [
+            slug for slug, author_id in owners.items()
+            if author_id != user.pk
+        ])
+        created = Note.objects.bulk_create([
+            Note(
+                author=user,
+                slug=slug,
+                title=record['title'],
+                text=record['text'],
+            )
+            for slug, record in records.items() if slug not in owners
+        ])
+        result['created'] = len(created)
+        Note.all_objects.filter(author=user, slug__in=records).restore()
+        existing = list(Note.objects.filter(author=user, slug__in=records))
+        for note in existing:
+            record = records[note.slug]
+            note.title, note.text = record['title'], record['text']
+            if note.changed_fields():
+                note.save()
+                result['updated'] += 1
+            note.set_tags(record['tags'])
+        if replace:
+            # Свою заметку с отклонённой записью в корзину не переносим.
+            result['deleted'] = Note.objects.filter(author=user).exclude(
+                slug__in=[*records, *invalid]
+            ).soft_delete()
+    return result
@@ -0,0 +1,13 @@
+from django.utils.functional import SimpleLazyObject
+
+from .models import UserStats
+
+
+def note_stats(request):
+    """Статистика текущего пользователя, загружаемая по первичному ключу."""
+    def get_stats():
+        if not request.user.is_authenticated:
+            return None
+        return UserStats.objects.filter(pk=request.user.pk).first()
+
+    return {'note_stats': SimpleLazyObject(get_stats)}
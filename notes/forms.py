@@ -1,29 +1,165 @@
-from pytils.translit import slugify
-
 from django import forms
 from django.core.exceptions import ValidationError
 
-from .models import Note
+from .models import Note, Tag
 
 WARNING = ' - такой slug уже существует, придумайте уникальное значение!'
+TAG_SEPARATOR = ','
+
+
+def parse_tags(value):
+    """Разбирает строку тегов в множество уникальных названий."""
+    max_length = Tag._meta.get_field('name').max_length
+    names = set()
+    for name in value.split(TAG_SEPARATOR):
+        name = name.strip().lower()
+        if not name:
+            continue
+        if len(name) > max_length:
+            raise ValidationError(
+                f'Тег «{name}» длиннее {max_length} символов'
+            )
+        names.add(name)
+    return names
 
 
 class NoteForm(forms.ModelForm):
     """Форма для создания или обновления заметки."""
 
+    tags = forms.CharField(
+        label='Теги',
+        required=False,
+        help_text='Перечислите теги через запятую',
+    )
+    version = forms.IntegerField(
+        widget=forms.HiddenInput,
+        required=False,
+        min_value=1,
+    )
+
     class Meta:
         model = Note
         fields = ('title', 'text', 'slug')
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.initial.setdefault('version', self.instance.version)
+        if self.instance.pk:
+            self.initial.setdefault('tags', f'{TAG_SEPARATOR} '.join(
+                self.instance.tags.values_list('name', flat=True)
+            ))
+
     def clean_slug(self):
         """Обрабатывает случай, если slug не уникален."""
         cleaned_data = super().clean()
         slug = cleaned_data.get('slug')
         if not slug:
+            from pytils.translit import slugify
+
             title = cleaned_data.get('title')
             slug = slugify(title)[:100]
-        if Note.objects.filter(
+        if Note.all_objects.filter(
                 slug=slug
         ).exclude(id=self.instance.pk).exists():
             raise ValidationError(slug + WARNING)
         return slug
+
+    def clean_tags(self):
+        return parse_tags(self.cleaned_data['tags'])
+
+    def save(self, commit=True):
+        """Сохраняет заметку, проверяя версию, которую видел пользователь.
+
+        Версия проверяется и при правке одних тегов: иначе устаревшая
+        форма молча перезаписала бы их.
+        """
+        version = self.cleaned_data.get('version')
+        if version:
+            self.instance.version = version
+        note = super().save(commit=False)
+        if commit:
+            note.save(check_version=bool(version))
+            self._save_m2m()
+        return note
+
+    def _save_m2m(self):
+        super()._save_m2m()
+        self.instance.set_tags(self.cleaned_data['tags'])
+
+
+class NoteBulkForm(forms.Form):
+    """Действие сразу над несколькими заметками списка."""
+
+    DELETE = 'delete'
+    TAG = 'tag'
+    EXPORT = 'export'
+
+    action = forms.ChoiceField(
+        label='Действие',
+        choices=(
+            (DELETE, 'Удалить в корзину'),
+            (TAG, 'Добавить теги'),
+            (EXPORT, 'Выгрузить в JSONL'),
+        ),
+        widget=forms.Select(attrs={'class': 'form-select form-select-sm'}),
+    )
+    notes = forms.Field(required=False, widget=forms.MultipleHiddenInput)
+    all_notes = forms.BooleanField(
+        label='Все заметки списка',
+        required=False,
+    )
+    tag = forms.Field(required=False, widget=forms.MultipleHiddenInput)
+    tags = forms.CharField(
+        label='Теги',
+        required=False,
+        widget=forms.TextInput(attrs={
+            'class': 'form-control form-control-sm',
+            'placeholder': 'Теги через запятую',
+        }),
+    )
+
+    def clean_notes(self):
+        try:
+            return {int(pk) for pk in self.cleaned_data['notes'] or ()}
+        except ValueError:
+            raise ValidationError('Некорректный номер заметки')
+
+    def clean_tag(self):
+        """Теги фильтра списка, по которому выбраны «все заметки»."""
+        return [
+            name.strip().lower()
+            for name in self.cleaned_data['tag'] or ()
+            if name.strip()
+        ]
+
+    def clean_tags(self):
+        return parse_tags(self.cleaned_data['tags'])
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if not cleaned_data.get('notes') and not cleaned_data.get(
+            'all_notes'
+        ):
+            raise ValidationError('Не выбрано ни одной заметки')
+        if cleaned_data.get('action') == self.TAG and not cleaned_data.get(
+            'tags'
+        ):
+            self.add_error('tags', 'Укажите теги')
+        return cleaned_data
+
+
+class NoteImportForm(forms.Form):
+    """Загрузка файла экспорта для восстановления заметок."""
+
+    file = forms.FileField(
+        label='Файл экспорта',
+        widget=forms.ClearableFileInput(attrs={
+            'class': 'form-control form-control-sm',
+            'accept': '.jsonl',
+        }),
+    )
+    replace = forms.BooleanField(
+        label='Убрать в корзину заметки, которых нет в файле',
+        required=False,
+        widget=forms.CheckboxInput(attrs={'class': 'form-check-input'}),
+    )
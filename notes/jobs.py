@@ -0,0 +1,297 @@
+"""Очередь фоновых задач в базе данных без внешнего брокера."""
+import logging
+import os
+import socket
+import time
+import traceback
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import close_old_connections
+from django.db.models import F
+from django.utils import timezone
+
+from . import attachments, backups, trash
+from .models import Job, Note, Tag, UserStats
+
+logger = logging.getLogger(__name__)
+
+HANDLERS = {}
+
+BATCH_SIZE = 500
+
+
+def register(kind):
+    """Декоратор, регистрирующий обработчик задач типа kind."""
+    def decorator(handler):
+        HANDLERS[kind] = handler
+        return handler
+    return decorator
+
+
+def enqueue(kind, author=None, max_attempts=5, **payload):
+    """Ставит задачу в очередь и возвращает её."""
+    if kind not in HANDLERS:
+        raise ValueError(f'Неизвестный тип задачи: {kind}')
+    return Job.objects.create(
+        kind=kind, author=author, payload=payload, max_attempts=max_attempts
+    )
+
+
+def worker_name(number=0):
+    return f'{socket.gethostname()}:{os.getpid()}:{number}'
+
+
+def claim(worker):
+    """Атомарно забирает следующую готовую задачу.
+
+    Задачи зависших обработчиков возвращаются в работу после
+    NOTES_JOB_LEASE секунд. Попытка засчитывается уже при захвате,
+    поэтому задача, которая роняет сам обработчик, после max_attempts
+    захватов помечается ошибкой, а не повторяется бесконечно.
+    """
+    now = timezone.now()
+    lease = timedelta(seconds=settings.NOTES_JOB_LEASE)
+    ready = (
+        Job.objects.filter(status=Job.Status.QUEUED, run_after__lte=now)
+        | Job.objects.filter(
+            status=Job.Status.RUNNING,
+            locked_at__lt=now - lease,
+        )
+    )
+    for pk, status, locked_at, attempts, max_attempts in ready.order_by(
+        'run_after', 'pk'
+    ).values_list(
+        'pk', 'status', 'locked_at', 'attempts', 'max_attempts'
+    )[:10]:
+        if status == Job.Status.RUNNING and attempts >= max_attempts:
+            abandon(pk, locked_at, now)
+        elif lock(pk, status, locked_at, worker, now):
+            return Job.objects.get(pk=pk)
+    return None
+
+
+def lock(pk, status, locked_at, worker, now):
+    """Условный UPDATE, захватывающий задачу в прочитанном состоянии.
+
+    Условие включает и время прежнего захвата: задачу с истёкшей арендой
+    может перехватить только один обработчик, остальные не изменят
+    ни одной строки и возьмут следующую.
+    """
+    return Job.objects.filter(
+        pk=pk, status=status, locked_at=locked_at
+    ).update(
+        status=Job.Status.RUNNING,
+        attempts=F('attempts') + 1,
+        locked_by=worker,
+        locked_at=now,
+        updated_at=now,
+    )
+
+
+def abandon(pk, locked_at, now):
+    """Помечает ошибкой зависшую задачу, исчерпавшую попытки."""
+    return Job.objects.filter(
+        pk=pk, status=Job.Status.RUNNING, locked_at=locked_at
+    ).update(
+        status=Job.Status.FAILED,
+        locked_by='',
+        locked_at=None,
+        error='Обработчик не завершил задачу за отведённое время',
+        updated_at=now,
+    )
+
+
+def backoff(attempts):
+    """Задержка перед повтором: экспоненциальная, с ограничением сверху."""
+    return min(
+        settings.NOTES_JOB_BACKOFF_BASE * 2 ** (attempts - 1),
+        settings.NOTES_JOB_BACKOFF_MAX,
+    )
+
+
+def run(job):
+    """Выполняет взятую задачу и фиксирует результат или повтор.
+
+    Итог записывается, только если задача всё ещё за этим обработчиком:
+    после истечения аренды её состояние принадлежит новому владельцу.
+    """
+    owned = Job.objects.filter(pk=job.pk, locked_by=job.locked_by)
+    try:
+        result = HANDLERS[job.kind](job)
+    except Exception:
+        logger.exception('Задача %s завершилась ошибкой', job)
+        failed = job.attempts >= job.max_attempts
+        delay = timedelta(seconds=backoff(job.attempts))
+        owned.update(
+            status=Job.Status.FAILED if failed else Job.Status.QUEUED,
+            run_after=timezone.now() + delay,
+            locked_by='',
+            locked_at=None,
+            error=traceback.format_exc(),
+            updated_at=timezone.now(),
+        )
+        return False
+    owned.update(
+        status=Job.Status.DONE,
+        locked_by='',
+        locked_at=None,
+        result=result,
+        error='',
+        updated_at=timezone.now(),
+    )
+    return True
+
+
+def work(worker, once=False, poll_interval=None):
+    """Цикл обработчика: берёт и выполняет задачи.
+
+    При once=True выходит, как только очередь опустела. Возвращает
+    количество выполненных задач.
+    """
+    if poll_interval is None:
+        poll_interval = settings.NOTES_JOB_POLL_INTERVAL
+    processed = 0
+    while True:
+        close_old_connections()
+        job = claim(worker)
+        if job is None:
+            if once:
+                return processed
+            time.sleep(poll_interval)
+            continue
+        run(job)
+        processed += 1
+
+
+@register('reconcile_user_stats')
+def reconcile_user_stats(job):
+    """Сверяет статистику всех пользователей пакетами."""
+    users = get_user_model().objects.order_by('pk')
+    total = users.count()
+    done = repaired = last_pk = 0
+    while True:
+        user_ids = list(
+            users.filter(pk__gt=last_pk).values_list('pk', flat=True)[
+                :BATCH_SIZE
+            ]
+        )
+        if not user_ids:
+            break
+        repaired += UserStats.objects.reconcile(user_ids)
+        done += len(user_ids)
+        last_pk = user_ids[-1]
+        job.report_progress(done, total)
+    return {'checked': done, 'repaired': repaired}
+
+
+@register('recount_tags')
+def recount_tags(job):
+    """Пересчитывает счётчики тегов пакетами."""
+    tags = Tag.objects.order_by('pk')
+    if job.author_id:
+        tags = tags.filter(author_id=job.author_id)
+    total = tags.count()
+    done = last_pk = 0
+    while True:
+        tag_ids = list(
+            tags.filter(pk__gt=last_pk).values_list('pk', flat=True)[
+                :BATCH_SIZE
+            ]
+        )
+        if not tag_ids:
+            break
+        Tag.objects.filter(pk__in=tag_ids).recount()
+        done += len(tag_ids)
+        last_pk = tag_ids[-1]
+        job.report_progress(done, total)
+    return {'recounted': done}
+
+
+@register('fingerprint_notes')
+def fingerprint_notes(job):
+    """Вычисляет отпечатки заметок, у которых их ещё нет."""
+    notes = Note.objects.filter(fp_band_0__isnull=True)
+    total = notes.count()
+    done = 0
+    for size in notes.fill_fingerprints(BATCH_SIZE):
+        done += size
+        job.report_progress(done, total)
+    return {'fingerprinted': done}
+
+
+@register('clean_attachments')
+def clean_attachments(job):
+    """Удаляет файлы без вложений и брошенные загрузки."""
+    return {
+        'blobs': attachments.delete_orphan_blobs(),
+        'uploads': attachments.delete_stale_uploads(job.payload.get('days')),
+    }
+
+
+@register('purge_trash')
+def purge_trash(job):
+    """Удаляет заметки, пролежавшие в корзине срок хранения."""
+    notes = trash.expired(job.payload.get('days'))
+    total = notes.count()
+    done = 0
+    for size in notes.purge(BATCH_SIZE):
+        done += size
+        job.report_progress(done, total)
+    return {'purged': done, 'vacuumed': trash.incremental_vacuum()}
+
+
+@register('delete_users')
+def delete_users(job):
+    """Удаляет пользователей: заметки короткими пачками, затем аккаунты.
+
+    Задача выполняется вне транзакции, поэтому каждая пачка заметок
+    фиксируется отдельно, а каскад от пользователя остаётся небольшим.
+    """
+    users = get_user_model().objects
+    purged = 0
+    for done, user_id in enumerate(job.payload['user_ids'], 1):
+        purged += trash.purge_author(user_id)
+        users.filter(pk=user_id).delete()
+        job.report_progress(done, len(job.payload['user_ids']))
+    return {'users': len(job.payload['user_ids']), 'purged': purged}
+
+
+@register('export_notes')
+def export_notes(job):
+    """Выгружает заметки автора в файл JSONL для скачивания.
+
+    В payload либо notes — номера заметок, либо tags — фильтр списка.
+    """
+    notes = Note.objects.filter(author=job.author_id)
+    if 'notes' in job.payload:
+        notes = notes.filter(pk__in=job.payload['notes'])
+    else:
+        notes = notes.with_tags(job.payload.get('tags', ()), job.author_id)
+    total = notes.count()
+    exported = backups.write_export(
+        notes,
+        backups.export_path(job.pk),
+        progress=lambda done: job.report_progress(done, total),
+    )
+    job.report_progress(exported, total)
+    return {'exported': exported}
+
+
+@register('import_notes')
+def import_notes(job):
+    """Восстанавливает заметки автора из загруженного файла экспорта.
+
+    Файл удаляется только после успешного импорта, чтобы повтор задачи
+    мог прочитать его снова.
+    """
+    path = Path(job.payload['path'])
+    result = backups.restore_author(
+        job.author,
+        backups.read_export(path),
+        replace=job.payload.get('replace', False),
+    )
+    path.unlink(missing_ok=True)
+    return result
@@ -0,0 +1,106 @@
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from notes import backups
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Снимает онлайн-копию базы, не останавливая приложение, '
+        'или выгружает заметки отдельных авторов в JSONL.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output-dir',
+            type=Path,
+            default=settings.NOTES_BACKUP_DIR,
+            help='Каталог для резервных копий.',
+        )
+        parser.add_argument(
+            '--pages',
+            type=int,
+            default=backups.BACKUP_PAGES,
+            help='Сколько страниц базы копировать за один шаг.',
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=backups.BACKUP_SLEEP,
+            help='Пауза между шагами в секундах.',
+        )
+        parser.add_argument(
+            '--keep',
+            type=int,
+            default=settings.NOTES_BACKUP_KEEP,
+            help='Сколько последних полных копий хранить; 0 — все.',
+        )
+        parser.add_argument(
+            '--no-verify',
+            action='store_false',
+            dest='verify',
+            help='Не проверять копию после снятия.',
+        )
+        parser.add_argument(
+            '--author',
+            action='append',
+            default=[],
+            metavar='USERNAME',
+            help='Выгрузить заметки автора в JSONL вместо полной копии.',
+        )
+        parser.add_argument(
+            '--check',
+            type=Path,
+            metavar='PATH',
+            help='Только проверить существующую копию.',
+        )
+
+    def handle(self, *args, output_dir, **options):
+        if options['check']:
+            self.report(options['check'])
+            return
+        if options['author']:
+            self.export(output_dir, options['author'])
+            return
+        path = output_dir / backups.backup_name()
+        try:
+            backups.backup(path, options['pages'], options['sleep'])
+        except backups.BackupError as error:
+            raise CommandError(error)
+        self.stdout.write(f'Резервная копия: {path}')
+        if options['verify']:
+            self.report(path)
+        if options['keep']:
+            for old in backups.rotate(output_dir, options['keep']):
+                self.stdout.write(f'Удалена старая копия: {old}')
+
+    def report(self, path):
+        try:
+            counts = backups.verify(path)
+        except backups.BackupError as error:
+            raise CommandError(f'Копия {path} повреждена: {error}')
+        self.stdout.write(
+            'Проверка пройдена: '
+            + ', '.join(f'{label}: {count}' for label, count in counts.items())
+        )
+
+    def export(self, output_dir, usernames):
+        users = User.objects.filter(username__in=usernames)
+        missing = set(usernames) - {user.username for user in users}
+        if missing:
+            raise CommandError(
+                'Нет пользователей: ' + ', '.join(sorted(missing))
+            )
+        output_dir.mkdir(parents=True, exist_ok=True)
+        stamp = f'{timezone.localtime():%Y%m%d-%H%M%S}'
+        for user in users:
+            path = output_dir / f'notes-{user.username}-{stamp}.jsonl'
+            with open(path, 'w', encoding='utf-8') as stream:
+                exported = backups.export_author(user, stream)
+            self.stdout.write(f'{user.username}: {exported} заметок в {path}')
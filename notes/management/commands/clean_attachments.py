@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from notes import attachments
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет файлы, на которые не ссылается ни одно вложение, '
+        'и брошенные незавершённые загрузки.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=None,
+            help='Удалять загрузки, начатые раньше стольких дней назад.',
+        )
+
+    def handle(self, *args, days, **options):
+        blobs = attachments.delete_orphan_blobs()
+        uploads = attachments.delete_stale_uploads(days)
+        self.stdout.write(
+            f'Удалено файлов: {blobs}, брошенных загрузок: {uploads}'
+        )
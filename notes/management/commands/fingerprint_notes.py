@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from notes.models import Note
+
+
+class Command(BaseCommand):
+    help = 'Вычисляет MinHash-отпечатки заметок для поиска дубликатов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Количество заметок в одном UPDATE.',
+        )
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Пересчитать отпечатки всех заметок, а не только пустые.',
+        )
+
+    def handle(self, *args, batch_size, **options):
+        notes = Note.objects.all()
+        if not options['all']:
+            notes = notes.filter(fp_band_0__isnull=True)
+        done = 0
+        for size in notes.fill_fingerprints(batch_size):
+            done += size
+        self.stdout.write(f'Обработано заметок: {done}')
@@ -0,0 +1,52 @@
+import json
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from notes import memory
+
+
+def kib(size):
+    return f'{size / 1024:.1f} KiB'
+
+
+class Command(BaseCommand):
+    help = 'Сводка профилирования памяти по маршрутам из всех процессов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dir',
+            type=Path,
+            default=settings.NOTES_MEMORY_DIR,
+            help='Каталог с файлами замеров процессов.',
+        )
+        parser.add_argument(
+            '--top',
+            type=int,
+            default=memory.TOP_SITES,
+            help='Сколько мест выделения памяти показывать на маршрут.',
+        )
+        parser.add_argument(
+            '--json',
+            action='store_true',
+            help='Вывести отчёт в JSON.',
+        )
+
+    def handle(self, *args, top, **options):
+        rows = memory.report(options['dir'], top)
+        if options['json']:
+            self.stdout.write(json.dumps(rows, ensure_ascii=False, indent=2))
+            return
+        if not rows:
+            self.stdout.write('Замеров нет')
+            return
+        for row in rows:
+            self.stdout.write(
+                f'{row["route"]}: замеров {row["samples"]}, '
+                f'пик {kib(row["peak_max"])} '
+                f'(в среднем {kib(row["peak_avg"])}), '
+                f'удержано в среднем {kib(row["retained_avg"])}'
+            )
+            for site, size in row['sites'].items():
+                self.stdout.write(f'    {kib(size):>12}  {site}')
@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+
+from notes import trash
+
+
+class Command(BaseCommand):
+    help = (
+        'Окончательно удаляет заметки из корзины небольшими пачками '
+        'и возвращает освободившееся место в файле базы.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=None,
+            help='Удалять заметки старше стольких дней в корзине.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=trash.PURGE_BATCH_SIZE,
+            help='Наибольшее количество заметок в одной транзакции.',
+        )
+        parser.add_argument(
+            '--time-limit',
+            type=float,
+            default=trash.PURGE_TIME_LIMIT,
+            help='Желаемая длительность одной транзакции в секундах.',
+        )
+        parser.add_argument(
+            '--vacuum-pages',
+            type=int,
+            default=trash.VACUUM_PAGES,
+            help='Сколько страниц возвращать за один шаг; 0 — не возвращать.',
+        )
+
+    def handle(self, *args, days, batch_size, time_limit, vacuum_pages,
+               **options):
+        purged = sum(
+            trash.expired(days).purge(batch_size, time_limit)
+        )
+        freed = 0
+        if vacuum_pages:
+            freed = trash.incremental_vacuum(vacuum_pages)
+        self.stdout.write(
+            f'Удалено заметок: {purged}, освобождено страниц: {freed}'
+        )
@@ -0,0 +1,36 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from notes.models import UserStats
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Сверяет статистику пользователей с заметками и исправляет её.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Количество пользователей в одной транзакции.',
+        )
+
+    def handle(self, *args, batch_size, **options):
+        last_pk = 0
+        checked = repaired = 0
+        while True:
+            user_ids = list(
+                User.objects.filter(pk__gt=last_pk).order_by('pk').values_list(
+                    'pk', flat=True
+                )[:batch_size]
+            )
+            if not user_ids:
+                break
+            repaired += UserStats.objects.reconcile(user_ids)
+            checked += len(user_ids)
+            last_pk = user_ids[-1]
+        self.stdout.write(
+            f'Проверено пользователей: {checked}, исправлено: {repaired}'
+        )
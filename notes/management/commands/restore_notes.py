@@ -0,0 +1,52 @@
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from notes import backups
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Восстанавливает заметки одного пользователя в живой базе '
+        'из полной резервной копии или JSONL-выгрузки.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'source',
+            type=Path,
+            help='Файл копии (*.sqlite3) или выгрузки (*.jsonl).',
+        )
+        parser.add_argument('username', help='Чьи заметки восстановить.')
+        parser.add_argument(
+            '--replace',
+            action='store_true',
+            help='Удалить заметки пользователя, которых нет в источнике.',
+        )
+
+    def handle(self, *args, source, username, replace, **options):
+        try:
+            user = User.objects.get(username=username)
+        except User.DoesNotExist:
+            raise CommandError(f'Нет пользователя {username}')
+        try:
+            if source.suffix == '.jsonl':
+                records = list(backups.read_export(source))
+            else:
+                backups.verify(source)
+                records = backups.read_backup(source, username)
+        except (OSError, ValueError, backups.BackupError) as error:
+            raise CommandError(f'Не удалось прочитать {source}: {error}')
+        result = backups.restore_author(user, records, replace=replace)
+        self.stdout.write(
+            f'Создано: {result["created"]}, обновлено: {result["updated"]}, '
+            f'в корзину: {result["deleted"]}'
+        )
+        if result['skipped']:
+            self.stderr.write(
+                'Пропущены занятые другими авторами slug: '
+                + ', '.join(result['skipped'])
+            )
@@ -0,0 +1,57 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, wait
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from notes import jobs
+
+
+def init_worker():
+    """Готовит дочерний процесс: свой Django и свои соединения с БД."""
+    django.setup()
+    connections.close_all()
+
+
+def run_worker(number, once, poll_interval):
+    return jobs.work(jobs.worker_name(number), once, poll_interval)
+
+
+class Command(BaseCommand):
+    help = 'Запускает пул процессов, выполняющих фоновые задачи заметок.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Размер пула; 0 — выполнять задачи в текущем процессе.',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Завершиться, когда очередь опустеет.',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            help='Пауза в секундах при пустой очереди '
+                 '(по умолчанию NOTES_JOB_POLL_INTERVAL).',
+        )
+
+    def handle(self, *args, processes, once, poll_interval, **options):
+        if processes < 1:
+            processed = jobs.work(jobs.worker_name(), once, poll_interval)
+        else:
+            connections.close_all()
+            with ProcessPoolExecutor(
+                max_workers=processes, initializer=init_worker
+            ) as pool:
+                futures = [
+                    pool.submit(run_worker, number, once, poll_interval)
+                    for number in range(processes)
+                ]
+                wait(futures)
+            processed = sum(future.result() for future in futures)
+        self.stdout.write(f'Выполнено задач: {processed}')
@@ -0,0 +1,212 @@
+"""Выборочное профилирование памяти запросов через tracemalloc.
+
+Включается переменной окружения YANOTE_MEMORY_PROFILING=1. Трассировка
+запускается только на время выбранного запроса, поэтому остальные
+запросы не платят за неё ничего. Доля выбранных запросов ограничена
+вероятностью NOTES_MEMORY_SAMPLE_RATE и бюджетом накладных расходов
+NOTES_MEMORY_OVERHEAD: если выбранные запросы заняли большую долю
+времени работы процесса, выборка пропускается, пока доля не снизится.
+
+Каждый процесс пишет свою сводку в NOTES_MEMORY_DIR/memory-<pid>.json,
+отчёт объединяет файлы всех процессов.
+"""
+import json
+import os
+import random
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+FILE_PATTERN = 'memory-*.json'
+TOP_SITES = 10
+
+
+def site_key(trace_frame):
+    return f'{trace_frame.filename}:{trace_frame.lineno}'
+
+
+class RouteStats:
+    """Накопленные замеры одного маршрута."""
+
+    def __init__(self, samples=0, peak_max=0, peak_total=0,
+                 retained_total=0, sites=None):
+        self.samples = samples
+        self.peak_max = peak_max
+        self.peak_total = peak_total
+        self.retained_total = retained_total
+        self.sites = Counter(sites or {})
+
+    def add(self, peak, retained, sites):
+        self.samples += 1
+        self.peak_max = max(self.peak_max, peak)
+        self.peak_total += peak
+        self.retained_total += retained
+        self.sites.update(sites)
+
+    def merge(self, other):
+        self.samples += other.samples
+        self.peak_max = max(self.peak_max, other.peak_max)
+        self.peak_total += other.peak_total
+        self.retained_total += other.retained_total
+        self.sites.update(other.sites)
+
+    def as_dict(self, top=None):
+        return {
+            'samples': self.samples,
+            'peak_max': self.peak_max,
+            'peak_total': self.peak_total,
+            'retained_total': self.retained_total,
+            'sites': dict(self.sites.most_common(top)),
+        }
+
+
+class Sampler:
+    """Решает, какие запросы профилировать, и копит результаты процесса."""
+
+    def __init__(self, directory, sample_rate, overhead, frames=1):
+        self.directory = Path(directory)
+        self.sample_rate = sample_rate
+        self.overhead = overhead
+        self.frames = frames
+        self.started = time.monotonic()
+        self.spent = 0.0
+        self.routes = {}
+        self.lock = threading.Lock()
+
+    def should_sample(self):
+        """Случайная выборка в пределах бюджета накладных расходов."""
+        if random.random() >= self.sample_rate:
+            return False
+        elapsed = time.monotonic() - self.started
+        return self.spent <= self.overhead * elapsed
+
+    def profile(self, call, route):
+        """Выполняет call() под tracemalloc и записывает замер маршрута.
+
+        route() вызывается после call(): имя маршрута известно только
+        после разрешения URL. У потокового ответа строки рендерятся уже
+        после возврата из call(), поэтому трассировка продолжается, пока
+        содержимое не будет отдано целиком, как в QueryBudgetMiddleware.
+
+        tracemalloc общий на процесс, поэтому одновременно профилируется
+        только один запрос; остальные в это время выполняются без него.
+        Если трассировку уже включил кто-то другой, запрос не трогаем.
+        """
+        if tracemalloc.is_tracing() or not self.lock.acquire(blocking=False):
+            return call()
+        started = time.monotonic()
+        try:
+            tracemalloc.start(self.frames)
+            result = call()
+        except BaseException:
+            self.finish(started)
+            raise
+        if getattr(result, 'streaming', False) and not result.is_async:
+            result.streaming_content = self.stream(
+                result.streaming_content, route, started
+            )
+        else:
+            self.finish(started, route)
+        return result
+
+    def stream(self, content, route, started):
+        finished = False
+        try:
+            yield from content
+            finished = True
+        finally:
+            # Оборванную отдачу не записываем: замер был бы неполным.
+            self.finish(started, route if finished else None)
+
+    def finish(self, started, route=None):
+        """Останавливает трассировку; если задан route, пишет замер."""
+        try:
+            try:
+                if route is not None:
+                    current, peak = tracemalloc.get_traced_memory()
+                    snapshot = tracemalloc.take_snapshot()
+            finally:
+                tracemalloc.stop()
+            if route is None:
+                return
+            sites = {
+                site_key(stat.traceback[0]): stat.size
+                for stat in snapshot.statistics('lineno')[:TOP_SITES]
+            }
+            stats = self.routes.setdefault(route(), RouteStats())
+            stats.add(peak, current, sites)
+            self.flush()
+        finally:
+            # Весь выбранный запрос считается накладными расходами:
+            # под трассировкой он сам по себе выполняется медленнее.
+            self.spent += time.monotonic() - started
+            self.lock.release()
+
+    def flush(self):
+        """Атомарно перезаписывает файл сводки процесса."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / f'memory-{os.getpid()}.json'
+        temporary = path.with_name(path.name + '.tmp')
+        temporary.write_text(json.dumps({
+            route: stats.as_dict() for route, stats in self.routes.items()
+        }))
+        os.replace(temporary, path)
+
+
+def report(directory=None, top=TOP_SITES):
+    """Сводка по маршрутам из файлов всех процессов.
+
+    Маршруты отсортированы по наибольшему пику. Для каждого — число
+    замеров, пик, средние пик и удержанная память, главные места
+    выделения памяти.
+    """
+    directory = Path(directory or settings.NOTES_MEMORY_DIR)
+    routes = {}
+    for path in directory.glob(FILE_PATTERN):
+        try:
+            data = json.loads(path.read_text())
+        except (OSError, ValueError):
+            # Файл мог исчезнуть или ещё писаться другим процессом.
+            continue
+        for route, values in data.items():
+            routes.setdefault(route, RouteStats()).merge(RouteStats(**values))
+    rows = []
+    for route, stats in routes.items():
+        row = stats.as_dict(top)
+        row['route'] = route
+        row['peak_avg'] = stats.peak_total // stats.samples
+        row['retained_avg'] = stats.retained_total // stats.samples
+        rows.append(row)
+    return sorted(rows, key=lambda row: row['peak_max'], reverse=True)
+
+
+class MemoryProfilingMiddleware:
+    """Профилирует память выборочных запросов по имени маршрута."""
+
+    def __init__(self, get_response):
+        if not settings.NOTES_MEMORY_PROFILING:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sampler = Sampler(
+            settings.NOTES_MEMORY_DIR,
+            settings.NOTES_MEMORY_SAMPLE_RATE,
+            settings.NOTES_MEMORY_OVERHEAD,
+        )
+
+    def __call__(self, request):
+        if not self.sampler.should_sample():
+            return self.get_response(request)
+        return self.sampler.profile(
+            lambda: self.get_response(request),
+            lambda: self.route_name(request),
+        )
+
+    @staticmethod
+    def route_name(request):
+        match = request.resolver_match
+        return match.view_name if match else 'unresolved'
@@ -0,0 +1,76 @@
+"""Сжатие ответов, включая потоковые страницы."""
+import secrets
+import zlib
+from gzip import GzipFile
+from http import HTTPStatus
+
+from django.conf import settings
+from django.http import FileResponse
+from django.middleware.gzip import GZipMiddleware
+from django.utils.text import StreamingBuffer
+
+COMPRESSIBLE_TYPES = (
+    'text/',
+    'application/json',
+    'application/javascript',
+    'application/x-ndjson',
+    'image/svg+xml',
+)
+
+
+def compress_chunks(chunks, *, max_random_bytes=None):
+    """Сжимает поток, сбрасывая сжатые данные после каждого фрагмента.
+
+    django.utils.text.compress_sequence копит данные в zlib, и шапка
+    потоковой страницы уходила бы клиенту только вместе с концом. Как и
+    там, имя файла случайной длины до max_random_bytes байт меняет длину
+    ответа и защищает страницы с csrf-токеном от атаки BREACH.
+    """
+    filename = None
+    if max_random_bytes:
+        filename = b'a' * secrets.randbelow(max_random_bytes)
+    buffer = StreamingBuffer()
+    with GzipFile(
+        filename=filename, mode='wb', compresslevel=6, fileobj=buffer,
+        mtime=0,
+    ) as zfile:
+        yield buffer.read()
+        for chunk in chunks:
+            zfile.write(chunk)
+            zfile.flush(zlib.Z_SYNC_FLUSH)
+            yield buffer.read()
+    yield buffer.read()
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """Сжатие gzip для обычных и потоковых ответов.
+
+    Не сжимает короткие ответы (меньше NOTES_GZIP_MIN_LENGTH байт),
+    несжимаемые типы, файлы вложений и частичные ответы на Range,
+    где сжатие сломало бы смещения.
+    """
+
+    min_length = getattr(settings, 'NOTES_GZIP_MIN_LENGTH', 1024)
+
+    def process_response(self, request, response):
+        if (
+            response.status_code == HTTPStatus.PARTIAL_CONTENT
+            or isinstance(response, FileResponse)
+            or not response.get('Content-Type', '').startswith(
+                COMPRESSIBLE_TYPES
+            )
+            or (
+                not response.streaming
+                and len(response.content) < self.min_length
+            )
+        ):
+            return response
+        chunks = None
+        if response.streaming and not response.is_async:
+            chunks = response.streaming_content
+        response = super().process_response(request, response)
+        if chunks is not None and response.get('Content-Encoding') == 'gzip':
+            response.streaming_content = compress_chunks(
+                chunks, max_random_bytes=self.max_random_bytes
+            )
+        return response
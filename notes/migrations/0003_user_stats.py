@@ -0,0 +1,64 @@
+# Generated by Django 5.1.1 on 2026-10-19 18:01
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import Coalesce, Length
+
+BATCH_SIZE = 500
+
+
+def backfill_user_stats(apps, schema_editor):
+    """Заполняет статистику авторов, у которых уже есть заметки.
+
+    Повторяет UserStatsQuerySet.reconcile на исторических моделях,
+    по BATCH_SIZE авторов за раз. Таблица только что создана, поэтому
+    строки лишь вставляются.
+    """
+    Note = apps.get_model('notes', 'Note')
+    UserStats = apps.get_model('notes', 'UserStats')
+    db = schema_editor.connection.alias
+    author_ids = list(
+        Note.objects.using(db).order_by('author').values_list(
+            'author', flat=True
+        ).distinct()
+    )
+    for start in range(0, len(author_ids), BATCH_SIZE):
+        batch = author_ids[start:start + BATCH_SIZE]
+        totals = Note.objects.using(db).filter(
+            author__in=batch
+        ).order_by().values('author').annotate(
+            notes=Count('pk'),
+            chars=Coalesce(Sum(Length('text')), 0),
+        ).values_list('author', 'notes', 'chars')
+        UserStats.objects.using(db).bulk_create(
+            [UserStats(user_id=author_id, notes_count=notes, chars_count=chars)
+             for author_id, notes, chars in totals],
+            ignore_conflicts=True,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('notes', '0002_tags'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='note_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('notes_count', models.PositiveIntegerField(default=0, verbose_name='Заметок')),
+                ('chars_count', models.PositiveBigIntegerField(default=0, verbose_name='Символов')),
+                ('last_edited_at', models.DateTimeField(blank=True, null=True, verbose_name='Последнее изменение')),
+            ],
+            options={
+                'verbose_name': 'статистика пользователя',
+                'verbose_name_plural': 'статистика пользователей',
+            },
+        ),
+        migrations.RunPython(backfill_user_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.1.1 on 2026-10-19 18:08
+
+from django.conf import settings
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+
+
+def normalize_title(title):
+    """Копия notes.models.normalize_title на момент миграции."""
+    from pytils.translit import translify
+
+    return ' '.join(translify(title.casefold(), strict=False).split())
+
+
+def fill_title_keys(apps, schema_editor):
+    Note = apps.get_model('notes', 'Note')
+    last_pk = 0
+    while True:
+        batch = list(
+            Note.objects.filter(pk__gt=last_pk).order_by('pk').only(
+                'pk', 'title'
+            )[:BATCH_SIZE]
+        )
+        if not batch:
+            break
+        for note in batch:
+            note.title_key = normalize_title(note.title)
+        Note.objects.bulk_update(batch, ('title_key',))
+        last_pk = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0006_note_fingerprints'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='note',
+            name='title_key',
+            field=models.CharField(blank=True, default='', editable=False, max_length=300, verbose_name='Ключ заголовка'),
+        ),
+        migrations.AddIndex(
+            model_name='note',
+            index=models.Index(fields=['author', 'title_key'], name='note_author_title_key_idx'),
+        ),
+        migrations.RunPython(fill_title_keys, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.1.1 on 2026-10-19 18:13
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0007_note_title_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Blob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64, unique=True, verbose_name='SHA-256')),
+                ('size', models.PositiveBigIntegerField(verbose_name='Размер')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Загружен')),
+            ],
+            options={
+                'verbose_name': 'файл',
+                'verbose_name_plural': 'файлы',
+            },
+        ),
+        migrations.CreateModel(
+            name='Attachment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, verbose_name='Имя файла')),
+                ('content_type', models.CharField(default='application/octet-stream', max_length=100, verbose_name='Тип содержимого')),
+                ('uploaded_at', models.DateTimeField(auto_now_add=True, verbose_name='Загружен')),
+                ('note', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attachments', to='notes.note')),
+                ('blob', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='notes.blob')),
+            ],
+            options={
+                'verbose_name': 'вложение',
+                'verbose_name_plural': 'вложения',
+                'ordering': ('pk',),
+            },
+        ),
+        migrations.CreateModel(
+            name='Upload',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=255, verbose_name='Имя файла')),
+                ('content_type', models.CharField(default='application/octet-stream', max_length=100, verbose_name='Тип содержимого')),
+                ('size', models.PositiveBigIntegerField(verbose_name='Размер')),
+                ('received', models.PositiveBigIntegerField(default=0, verbose_name='Получено')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Начата')),
+                ('note', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='uploads', to='notes.note')),
+            ],
+        ),
+    ]
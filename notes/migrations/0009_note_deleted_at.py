@@ -0,0 +1,49 @@
+# Generated by Django 5.1.1 on 2026-10-19 18:23
+
+from django.conf import settings
+from django.db import migrations, models
+
+INCREMENTAL = 2
+
+
+def enable_incremental_vacuum(apps, schema_editor):
+    """Переводит SQLite в режим auto_vacuum=INCREMENTAL.
+
+    Режим меняется только полным VACUUM, поэтому он выполняется один раз,
+    вне транзакции. Дальше освободившиеся страницы возвращаются
+    PRAGMA incremental_vacuum небольшими порциями.
+    """
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA auto_vacuum')
+        if cursor.fetchone()[0] == INCREMENTAL:
+            return
+        cursor.execute(f'PRAGMA auto_vacuum = {INCREMENTAL}')
+        cursor.execute('VACUUM')
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('notes', '0008_attachments'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='note',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Удалена'),
+        ),
+        migrations.AddIndex(
+            model_name='note',
+            index=models.Index(fields=['author', 'deleted_at'], name='note_author_deleted_at_idx'),
+        ),
+        migrations.RunPython(
+            enable_incremental_vacuum, migrations.RunPython.noop, atomic=False
+        ),
+    ]
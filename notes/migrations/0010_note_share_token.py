@@ -0,0 +1,18 @@
+# Generated by Django 5.1.1 on 2026-10-19 18:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0009_note_deleted_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='note',
+            name='share_token',
+            field=models.CharField(blank=True, editable=False, max_length=43, null=True, unique=True, verbose_name='Публичная ссылка'),
+        ),
+    ]
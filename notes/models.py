@@ -1,7 +1,383 @@
+import secrets
+import time
+import uuid
+from functools import partial
+from pathlib import Path
+
 from django.conf import settings
-from django.db import models
+from django.db import IntegrityError, models, router, transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery, Sum, signals
+from django.db.models.functions import Coalesce, Length
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import similarity
+
+FINGERPRINT_FIELDS = tuple(
+    f'fp_band_{band}' for band in range(similarity.BANDS)
+)
+# Поля, от которых зависит публичный снимок заметки.
+SNAPSHOT_FIELDS = frozenset({'title', 'text', 'share_token', 'deleted_at'})
+SHARE_TOKEN_BYTES = 16
+
+
+def normalize_title(title):
+    """Ключ заголовка для поиска по префиксу: нижний регистр и транслит."""
+    # pytils импортируется лениво, чтобы не замедлять старт воркеров.
+    from pytils.translit import translify
+
+    return ' '.join(translify(title.casefold(), strict=False).split())
+
+
+class VersionConflict(Exception):
+    """Заметку изменили после того, как она была прочитана."""
+
+    def __init__(self, note, current_version):
+        super().__init__(
+            f'Заметка {note.pk} уже изменена: версия {current_version}, '
+            f'ожидалась {note.version}'
+        )
+        self.note = note
+        self.current_version = current_version
+
+
+class NoteQuerySet(models.QuerySet):
+    """Запросы к заметкам с поддержкой денормализованных счётчиков."""
+
+    def alive(self):
+        return self.filter(deleted_at__isnull=True)
+
+    def trashed(self):
+        return self.filter(deleted_at__isnull=False)
+
+    def with_tags(self, names, author):
+        """Заметки автора, у которых есть все перечисленные теги.
+
+        Идентификаторы тегов находятся по уникальному индексу
+        (author, name), а соединение с NoteTag начинается с индекса
+        (tag, note): просматриваются только заметки с этими тегами.
+        """
+        names = set(names)
+        if not names:
+            return self
+        tag_ids = list(
+            Tag.objects.filter(author=author, name__in=names).values_list(
+                'pk', flat=True
+            )
+        )
+        if len(tag_ids) < len(names):
+            return self.none()
+        queryset = self
+        for tag_id in tag_ids:
+            queryset = queryset.filter(pk__in=NoteTag.objects.filter(
+                tag_id=tag_id
+            ).values('note_id'))
+        return queryset
+
+    def title_prefix(self, prefix):
+        """Заметки, ключ заголовка которых начинается с prefix.
+
+        Вместо LIKE используется диапазон по индексу (author, title_key):
+        в SQLite LIKE регистронезависим и не использует обычный индекс.
+        """
+        key = normalize_title(prefix)
+        return self.filter(
+            title_key__gte=key, title_key__lt=key + chr(0x10FFFF)
+        ).order_by('title_key')
+
+    def near_duplicates(self, note):
+        """Почти одинаковые заметки того же автора.
+
+        Кандидаты выбираются по совпадению любой LSH-полосы через индексы
+        (author, fp_band_N), затем проверяется сходство шинглов.
+        """
+        band_filter = Q()
+        for field in FINGERPRINT_FIELDS:
+            if getattr(note, field) is not None:
+                band_filter |= Q(**{field: getattr(note, field)})
+        if not band_filter:
+            return []
+        candidates = self.filter(band_filter, author=note.author_id).exclude(
+            pk=note.pk
+        )
+        note_shingles = similarity.shingles(f'{note.title}\n{note.text}')
+        return [
+            candidate for candidate in candidates
+            if similarity.jaccard(
+                note_shingles,
+                similarity.shingles(f'{candidate.title}\n{candidate.text}'),
+            ) >= similarity.THRESHOLD
+        ]
+
+    def fill_fingerprints(self, batch_size=500):
+        """Вычисляет отпечатки пакетами, возвращая размер каждого пакета.
+
+        Пишет через базовый менеджер, чтобы не менять версии заметок.
+        """
+        last_pk = 0
+        queryset = self.order_by('pk').only('pk', 'title', 'text')
+        while True:
+            batch = list(queryset.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                return
+            for note in batch:
+                note.fill_fingerprint()
+            Note._base_manager.bulk_update(batch, FINGERPRINT_FIELDS)
+            last_pk = batch[-1].pk
+            yield len(batch)
+
+    def clear_tags(self):
+        """Снимает все теги с заметок и пересчитывает счётчики тегов."""
+        with transaction.atomic(using=self.db):
+            links = NoteTag.objects.filter(note__in=self)
+            tag_ids = list(links.values_list('tag_id', flat=True).distinct())
+            links.delete()
+            Tag.objects.filter(pk__in=tag_ids).recount()
+
+    clear_tags.alters_data = True
+
+    def add_tags(self, names):
+        """Добавляет теги всем заметкам набора.
+
+        Теги и связи вставляются пакетами с пропуском уже существующих,
+        счётчики пересчитываются одним UPDATE. Возвращает число заметок.
+        """
+        names = set(names)
+        with transaction.atomic(using=self.db):
+            notes = list(self.order_by().values_list('pk', 'author_id'))
+            author_ids = {author_id for _, author_id in notes}
+            if not names or not notes:
+                return len(notes)
+            Tag.objects.bulk_create(
+                [Tag(author_id=author_id, name=name)
+                 for author_id in author_ids for name in names],
+                ignore_conflicts=True,
+            )
+            tags = {}
+            for pk, author_id in Tag.objects.filter(
+                author__in=author_ids, name__in=names
+            ).values_list('pk', 'author_id'):
+                tags.setdefault(author_id, []).append(pk)
+            NoteTag.objects.bulk_create(
+                [NoteTag(note_id=pk, tag_id=tag_id)
+                 for pk, author_id in notes for tag_id in tags[author_id]],
+                ignore_conflicts=True,
+            )
+            Tag.objects.filter(author__in=author_ids, name__in=names).recount()
+        return len(notes)
+
+    add_tags.alters_data = True
+
+    def stats_by_author(self):
+        """Количество заметок и символов по каждому автору."""
+        return self.order_by().values('author').annotate(
+            notes=Count('pk'),
+            chars=Coalesce(Sum(Length('text')), 0),
+        ).values_list('author', 'notes', 'chars')
+
+    def bulk_create(self, objs, *args, **kwargs):
+        """Создаёт заметки пакетом и обновляет статистику авторов."""
+        objs = list(objs)
+        for note in objs:
+            note.title_key = normalize_title(note.title)
+            note.fill_fingerprint()
+        with transaction.atomic(using=self.db):
+            objs = super().bulk_create(objs, *args, **kwargs)
+            totals = {}
+            for note in objs:
+                notes, chars = totals.get(note.author_id, (0, 0))
+                totals[note.author_id] = notes + 1, chars + len(note.text)
+            for author_id, (notes, chars) in totals.items():
+                UserStats.objects.apply(author_id, notes=notes, chars=chars)
+        return objs
+
+    def update(self, **kwargs):
+        """Обновляет заметки и статистику затронутых авторов.
+
+        Если меняются текст или автор, статистика по обновляемым строкам
+        считается до и после UPDATE, и авторам прибавляется разница:
+        остальные заметки авторов не пересчитываются.
+        """
+        with transaction.atomic(using=self.db):
+            author_ids = set(
+                self.order_by().values_list('author', flat=True).distinct()
+            )
+            kwargs.setdefault('version', F('version') + 1)
+            if kwargs.keys() & SNAPSHOT_FIELDS:
+                self._sync_snapshots_on_commit()
+            rows = None
+            if kwargs.keys() & {'author', 'author_id', 'text'}:
+                # После UPDATE строки могут перестать подходить под фильтр.
+                rows = self.model.all_objects.filter(
+                    pk__in=list(self.order_by().values_list('pk', flat=True))
+                ).alive()
+                before = list(rows.stats_by_author())
+            result = super().update(**kwargs)
+            new_author = kwargs.get('author_id', kwargs.get('author'))
+            if new_author is not None:
+                author_ids.add(getattr(new_author, 'pk', new_author))
+            if rows is not None:
+                totals = {}
+                for author_id, notes, chars in before:
+                    totals[author_id] = -notes, -chars
+                for author_id, notes, chars in rows.stats_by_author():
+                    old_notes, old_chars = totals.get(author_id, (0, 0))
+                    totals[author_id] = old_notes + notes, old_chars + chars
+                for author_id, (notes, chars) in totals.items():
+                    if notes or chars:
+                        UserStats.objects.apply(
+                            author_id, notes=notes, chars=chars
+                        )
+            UserStats.objects.filter(pk__in=author_ids).update(
+                last_edited_at=timezone.now()
+            )
+        return result
+
+    update.alters_data = True
+
+    def _sync_snapshots_on_commit(self):
+        """После коммита обновляет снимки заметок с открытыми ссылками."""
+        from . import sharing
+
+        shared = dict(
+            self.filter(share_token__isnull=False).values_list(
+                'pk', 'share_token'
+            )
+        )
+        if shared:
+            transaction.on_commit(
+                partial(sharing.sync, list(shared), list(shared.values())),
+                using=self.db,
+            )
+
+    def delete(self):
+        """Удаляет заметки и пересчитывает денормализованные счётчики."""
+        with transaction.atomic(using=self.db):
+            tag_ids = list(
+                NoteTag.objects.filter(note__in=self).values_list(
+                    'tag_id', flat=True
+                ).distinct()
+            )
+            totals = list(self.alive().stats_by_author())
+            result = super().delete()
+            Tag.objects.filter(pk__in=tag_ids).recount()
+            for author_id, notes, chars in totals:
+                UserStats.objects.apply(author_id, notes=-notes, chars=-chars)
+        return result
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+    def soft_delete(self):
+        """Переносит заметки в корзину, не удаляя строки.
+
+        Это один UPDATE по первичному ключу, поэтому блокировка записи
+        держится недолго даже для большого набора заметок.
+        """
+        return self._move_to(timezone.now())
+
+    soft_delete.alters_data = True
+    soft_delete.queryset_only = True
+
+    def restore(self):
+        """Возвращает заметки из корзины."""
+        return self._move_to(None)
+
+    restore.alters_data = True
+    restore.queryset_only = True
 
-from pytils.translit import slugify
+    def _move_to(self, deleted_at):
+        notes = self.trashed() if deleted_at is None else self.alive()
+        sign = 1 if deleted_at is None else -1
+        with transaction.atomic(using=self.db):
+            tag_ids = list(
+                NoteTag.objects.filter(note__in=notes).values_list(
+                    'tag_id', flat=True
+                ).distinct()
+            )
+            totals = list(notes.stats_by_author())
+            result = notes.update(deleted_at=deleted_at)
+            Tag.objects.filter(pk__in=tag_ids).recount()
+            for author_id, count, chars in totals:
+                UserStats.objects.apply(
+                    author_id, notes=sign * count, chars=sign * chars
+                )
+        return result
+
+    def purge(self, batch_size=500, time_limit=0.2):
+        """Окончательно удаляет заметки пачками, по транзакции на пачку.
+
+        Размер пачки подстраивается так, чтобы одна транзакция держала
+        блокировку записи SQLite не дольше time_limit секунд: медленная
+        пачка уменьшает следующую вдвое, быстрая — увеличивает до
+        batch_size. Генератор: после каждой пачки отдаёт число удалённых
+        заметок.
+        """
+        size = batch_size
+        while True:
+            pks = list(
+                self.order_by('pk').values_list('pk', flat=True)[:size]
+            )
+            if not pks:
+                return
+            started = time.monotonic()
+            self.model.all_objects.filter(pk__in=pks).delete()
+            elapsed = time.monotonic() - started
+            yield len(pks)
+            if elapsed > time_limit:
+                size = max(size // 2, 1)
+            elif elapsed < time_limit / 2:
+                size = min(size * 2, batch_size)
+
+
+class AliveNoteManager(models.Manager.from_queryset(NoteQuerySet)):
+    """Менеджер по умолчанию: заметки из корзины в нём не видны."""
+
+    def get_queryset(self):
+        return super().get_queryset().alive()
+
+
+class TagQuerySet(models.QuerySet):
+
+    def recount(self):
+        """Пересчитывает notes_count одним UPDATE по индексу тега."""
+        notes_count = NoteTag.objects.filter(
+            tag=OuterRef('pk'), note__deleted_at__isnull=True
+        ).order_by().values('tag').annotate(total=Count('pk')).values('total')
+        return self.update(notes_count=Coalesce(Subquery(notes_count), 0))
+
+    recount.alters_data = True
+
+
+class Tag(models.Model):
+    name = models.CharField(
+        'Название',
+        max_length=50,
+    )
+    author = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='note_tags',
+    )
+    notes_count = models.PositiveIntegerField(
+        'Количество заметок',
+        default=0,
+        editable=False,
+    )
+
+    objects = TagQuerySet.as_manager()
+
+    class Meta:
+        ordering = ('name',)
+        constraints = (
+            models.UniqueConstraint(
+                fields=('author', 'name'),
+                name='unique_tag_name_per_author',
+            ),
+        )
+
+    def __str__(self):
+        return self.name
 
 
 class Note(models.Model):
@@ -27,12 +403,561 @@ class Note(models.Model):
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
     )
+    version = models.PositiveIntegerField(
+        'Версия',
+        default=1,
+        editable=False,
+    )
+    title_key = models.CharField(
+        'Ключ заголовка',
+        max_length=300,
+        blank=True,
+        default='',
+        editable=False,
+    )
+    fp_band_0 = models.BigIntegerField(null=True, blank=True, editable=False)
+    fp_band_1 = models.BigIntegerField(null=True, blank=True, editable=False)
+    fp_band_2 = models.BigIntegerField(null=True, blank=True, editable=False)
+    fp_band_3 = models.BigIntegerField(null=True, blank=True, editable=False)
+    tags = models.ManyToManyField(
+        Tag,
+        through='NoteTag',
+        related_name='notes',
+        blank=True,
+    )
+    deleted_at = models.DateTimeField(
+        'Удалена',
+        null=True,
+        blank=True,
+        editable=False,
+    )
+    share_token = models.CharField(
+        'Публичная ссылка',
+        max_length=43,
+        unique=True,
+        null=True,
+        blank=True,
+        editable=False,
+    )
+
+    objects = AliveNoteManager()
+    all_objects = NoteQuerySet.as_manager()
+
+    class Meta:
+        indexes = (
+            models.Index(
+                fields=('author', 'title_key'),
+                name='note_author_title_key_idx',
+            ),
+            models.Index(
+                fields=('author', 'deleted_at'),
+                name='note_author_deleted_at_idx',
+            ),
+        ) + tuple(
+            models.Index(
+                fields=('author', f'fp_band_{band}'),
+                name=f'note_author_fp_band_{band}_idx',
+            )
+            for band in range(similarity.BANDS)
+        )
 
     def __str__(self):
         return self.title
 
-    def save(self, *args, **kwargs):
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Запоминает значения из БД, чтобы считать изменения без запроса."""
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        """Перечитывает поля из БД и запоминает их новые значения."""
+        super().refresh_from_db(
+            using=using, fields=fields, from_queryset=from_queryset
+        )
+        deferred = self.get_deferred_fields()
+        if fields is not None:
+            fields = set(fields)
+        if not hasattr(self, '_loaded_values'):
+            self._loaded_values = {}
+        self._loaded_values.update({
+            field.attname: getattr(self, field.attname)
+            for field in self._meta.concrete_fields
+            if field.attname not in deferred and (
+                fields is None
+                or field.name in fields or field.attname in fields
+            )
+        })
+
+    def _loaded_text_length(self):
+        loaded = getattr(self, '_loaded_values', {})
+        if 'text' in loaded:
+            return len(loaded['text'])
+        return Note._base_manager.filter(pk=self.pk).values_list(
+            Length('text'), flat=True
+        ).get()
+
+    def save(self, *args, check_version=False, **kwargs):
+        """Сохраняет заметку; изменения пишутся условным UPDATE по версии.
+
+        С check_version=True версия проверяется и увеличивается, даже если
+        ни одно поле не изменилось: так правка только тегов из формы тоже
+        не перезапишет чужие изменения. Обновление не проходит через
+        Model.save(), поэтому сигналы pre_save и post_save отправляются
+        здесь явно.
+        """
         if not self.slug:
+            from pytils.translit import slugify
+
             max_slug_length = self._meta.get_field('slug').max_length
             self.slug = slugify(self.title)[:max_slug_length]
-        super().save(*args, **kwargs)
+        self.title_key = normalize_title(self.title)
+        if self._state.adding or {
+            field.name for field in self.changed_fields()
+        } & {'title', 'text'}:
+            self.fill_fingerprint()
+        old_token = getattr(self, '_loaded_values', {}).get('share_token')
+        with transaction.atomic():
+            if self._state.adding:
+                changed = True
+                super().save(*args, **kwargs)
+                UserStats.objects.apply(
+                    self.author_id, notes=1, chars=len(self.text)
+                )
+            else:
+                old_author_id = getattr(self, '_loaded_values', {}).get(
+                    'author_id', self.author_id
+                )
+                old_length = self._loaded_text_length()
+                update_fields = kwargs.get('update_fields')
+                if update_fields is not None:
+                    update_fields = frozenset(update_fields)
+                using = kwargs.get('using') or router.db_for_write(
+                    type(self), instance=self
+                )
+                signals.pre_save.send(
+                    sender=type(self), instance=self, raw=False, using=using,
+                    update_fields=update_fields,
+                )
+                changed = self._save_changed(update_fields, check_version)
+                if changed and old_author_id == self.author_id:
+                    UserStats.objects.apply(
+                        self.author_id, chars=len(self.text) - old_length
+                    )
+                elif changed:
+                    UserStats.objects.apply(
+                        old_author_id, notes=-1, chars=-old_length
+                    )
+                    UserStats.objects.apply(
+                        self.author_id, notes=1, chars=len(self.text)
+                    )
+                signals.post_save.send(
+                    sender=type(self), instance=self, created=False,
+                    update_fields=update_fields, raw=False, using=using,
+                )
+            if changed:
+                self._sync_snapshot_on_commit(old_token)
+        self._loaded_values = {
+            field.attname: getattr(self, field.attname)
+            for field in self._meta.concrete_fields
+        }
+
+    def _sync_snapshot_on_commit(self, old_token):
+        from . import sharing
+
+        if old_token and old_token != self.share_token:
+            transaction.on_commit(partial(sharing.remove, old_token))
+        if self.share_token and self.deleted_at is None:
+            transaction.on_commit(partial(sharing.publish, self))
+
+    def fill_fingerprint(self):
+        """Вычисляет LSH-полосы MinHash-подписи заголовка и текста."""
+        values = similarity.bands(f'{self.title}\n{self.text}')
+        for field, value in zip(FINGERPRINT_FIELDS, values):
+            setattr(self, field, value)
+
+    def changed_fields(self):
+        """Поля, значения которых отличаются от загруженных из БД."""
+        loaded = getattr(self, '_loaded_values', {})
+        deferred = self.get_deferred_fields()
+        return [
+            field for field in self._meta.concrete_fields
+            if not field.primary_key
+            and field.attname != 'version'
+            and field.attname not in deferred
+            and (
+                field.attname not in loaded
+                or loaded[field.attname] != getattr(self, field.attname)
+            )
+        ]
+
+    def _save_changed(self, update_fields=None, check_version=False):
+        """Записывает только изменённые поля условным UPDATE по версии.
+
+        UPDATE ... WHERE id = ? AND version = ? не держит блокировок между
+        чтением и записью: если заметку успели изменить, ни одна строка не
+        обновится и будет выброшено VersionConflict. Возвращает False, если
+        записывать было нечего и проверка версии не требовалась.
+        """
+        fields = self.changed_fields()
+        if update_fields is not None:
+            fields = [
+                field for field in fields
+                if field.name in update_fields
+                or field.attname in update_fields
+            ]
+        if not fields and not check_version:
+            return False
+        updated = type(self)._base_manager.filter(
+            pk=self.pk, version=self.version
+        ).update(
+            version=F('version') + 1,
+            **{field.attname: getattr(self, field.attname) for field in fields}
+        )
+        if not updated:
+            current = type(self)._base_manager.filter(
+                pk=self.pk
+            ).values_list('version', flat=True).first()
+            raise VersionConflict(self, current)
+        self.version += 1
+        return True
+
+    def delete(self, *args, **kwargs):
+        if self.deleted_at is not None:
+            # Заметка в корзине уже не входит в счётчики.
+            return super().delete(*args, **kwargs)
+        with transaction.atomic():
+            tag_ids = list(self.tags.values_list('pk', flat=True))
+            old_length = self._loaded_text_length()
+            result = super().delete(*args, **kwargs)
+            Tag.objects.filter(pk__in=tag_ids).update(
+                notes_count=F('notes_count') - 1
+            )
+            UserStats.objects.apply(
+                self.author_id, notes=-1, chars=-old_length
+            )
+        return result
+
+    def trash(self):
+        """Переносит заметку в корзину."""
+        type(self).all_objects.filter(pk=self.pk).soft_delete()
+        self.refresh_from_db(fields=('deleted_at', 'version'))
+
+    def restore(self):
+        """Возвращает заметку из корзины."""
+        type(self).all_objects.filter(pk=self.pk).restore()
+        self.refresh_from_db(fields=('deleted_at', 'version'))
+
+    def share(self):
+        """Открывает публичную ссылку; снимок пишется после коммита."""
+        if not self.share_token:
+            self.share_token = secrets.token_urlsafe(SHARE_TOKEN_BYTES)
+            self.save(update_fields=('share_token',))
+
+    def unshare(self):
+        """Закрывает публичную ссылку и удаляет её снимок."""
+        if self.share_token:
+            self.share_token = None
+            self.save(update_fields=('share_token',))
+
+    def set_tags(self, names):
+        """Заменяет теги заметки, добавляя и удаляя связи пакетами."""
+        names = set(names)
+        with transaction.atomic():
+            current = dict(
+                self.tags.values_list('name', 'pk')
+            )
+            removed = [
+                pk for name, pk in current.items() if name not in names
+            ]
+            added = names - current.keys()
+            if removed:
+                NoteTag.objects.filter(note=self, tag__in=removed).delete()
+                Tag.objects.filter(pk__in=removed).update(
+                    notes_count=F('notes_count') - 1
+                )
+            if added:
+                Tag.objects.bulk_create(
+                    [Tag(author_id=self.author_id, name=name)
+                     for name in added],
+                    ignore_conflicts=True,
+                )
+                added_ids = list(
+                    Tag.objects.filter(
+                        author_id=self.author_id, name__in=added
+                    ).values_list('pk', flat=True)
+                )
+                NoteTag.objects.bulk_create(
+                    [NoteTag(note=self, tag_id=pk) for pk in added_ids]
+                )
+                Tag.objects.filter(pk__in=added_ids).update(
+                    notes_count=F('notes_count') + 1
+                )
+
+
+@receiver(signals.post_delete, sender=Note)
+def remove_share_snapshot(sender, instance, using, **kwargs):
+    """Удаляет снимок публичной ссылки после коммита удаления заметки.
+
+    Сигнал отправляется при любом удалении, в том числе каскадом от
+    пользователя, который обходит Note.delete() и NoteQuerySet.delete().
+    """
+    if instance.share_token:
+        from . import sharing
+
+        transaction.on_commit(
+            partial(sharing.remove, instance.share_token), using=using
+        )
+
+
+class NoteTag(models.Model):
+    note = models.ForeignKey(Note, on_delete=models.CASCADE)
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE)
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(
+                fields=('note', 'tag'),
+                name='unique_note_tag',
+            ),
+        )
+        indexes = (
+            models.Index(fields=('tag', 'note'), name='notetag_tag_note_idx'),
+        )
+
+
+class UserStatsQuerySet(models.QuerySet):
+
+    def apply(self, user_id, notes=0, chars=0):
+        """Атомарно прибавляет изменения к строке статистики пользователя.
+
+        Вызывается после записи заметок. Если строки ещё нет, она
+        создаётся по фактическим заметкам пользователя: разница сама по
+        себе не даёт верного итога для заметок, созданных до появления
+        статистики.
+        """
+        now = timezone.now()
+        changes = {
+            'notes_count': F('notes_count') + notes,
+            'chars_count': F('chars_count') + chars,
+            'last_edited_at': now,
+        }
+        if self.filter(pk=user_id).update(**changes):
+            return
+        notes_count, chars_count = self.actual([user_id]).get(
+            user_id, (0, 0)
+        )
+        try:
+            with transaction.atomic(using=self.db):
+                self.create(
+                    user_id=user_id,
+                    notes_count=notes_count,
+                    chars_count=chars_count,
+                    last_edited_at=now,
+                )
+        except IntegrityError:
+            self.filter(pk=user_id).update(**changes)
+
+    apply.alters_data = True
+
+    def actual(self, user_ids):
+        """Фактические (заметок, символов) по заметкам пользователей."""
+        return {
+            author_id: (notes, chars)
+            for author_id, notes, chars in Note.objects.filter(
+                author__in=user_ids
+            ).stats_by_author()
+        }
+
+    def reconcile(self, user_ids):
+        """Сверяет статистику с заметками и исправляет расхождения.
+
+        Возвращает количество исправленных строк.
+        """
+        user_ids = list(user_ids)
+        actual = self.actual(user_ids)
+        stored = self.in_bulk(user_ids)
+        created, updated = [], []
+        for user_id in user_ids:
+            notes, chars = actual.get(user_id, (0, 0))
+            stats = stored.get(user_id)
+            if stats is None:
+                if notes:
+                    created.append(UserStats(
+                        user_id=user_id, notes_count=notes, chars_count=chars
+                    ))
+            elif (stats.notes_count, stats.chars_count) != (notes, chars):
+                stats.notes_count, stats.chars_count = notes, chars
+                updated.append(stats)
+        with transaction.atomic(using=self.db):
+            self.bulk_create(created, ignore_conflicts=True)
+            self.bulk_update(updated, ('notes_count', 'chars_count'))
+        return len(created) + len(updated)
+
+    reconcile.alters_data = True
+
+
+class UserStats(models.Model):
+    """Денормализованная статистика заметок пользователя."""
+
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='note_stats',
+    )
+    notes_count = models.PositiveIntegerField('Заметок', default=0)
+    chars_count = models.PositiveBigIntegerField('Символов', default=0)
+    last_edited_at = models.DateTimeField(
+        'Последнее изменение', null=True, blank=True
+    )
+
+    objects = UserStatsQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'статистика пользователя'
+        verbose_name_plural = 'статистика пользователей'
+
+    def __str__(self):
+        return f'{self.user_id}: {self.notes_count}'
+
+
+class Job(models.Model):
+    """Фоновая задача, выполняемая командой run_workers."""
+
+    class Status(models.TextChoices):
+        QUEUED = 'queued', 'В очереди'
+        RUNNING = 'running', 'Выполняется'
+        DONE = 'done', 'Выполнена'
+        FAILED = 'failed', 'Ошибка'
+
+    kind = models.CharField('Тип', max_length=50)
+    payload = models.JSONField('Параметры', default=dict, blank=True)
+    author = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='note_jobs',
+    )
+    status = models.CharField(
+        'Статус',
+        max_length=10,
+        choices=Status.choices,
+        default=Status.QUEUED,
+    )
+    attempts = models.PositiveSmallIntegerField('Попыток', default=0)
+    max_attempts = models.PositiveSmallIntegerField(
+        'Максимум попыток', default=5
+    )
+    run_after = models.DateTimeField('Не раньше', default=timezone.now)
+    locked_by = models.CharField('Обработчик', max_length=100, blank=True)
+    locked_at = models.DateTimeField('Взята в работу', null=True, blank=True)
+    progress_done = models.PositiveIntegerField('Выполнено', default=0)
+    progress_total = models.PositiveIntegerField('Всего', default=0)
+    result = models.JSONField('Результат', null=True, blank=True)
+    error = models.TextField('Ошибка', blank=True)
+    created_at = models.DateTimeField('Создана', auto_now_add=True)
+    updated_at = models.DateTimeField('Изменена', auto_now=True)
+
+    class Meta:
+        verbose_name = 'задача'
+        verbose_name_plural = 'задачи'
+        indexes = (
+            models.Index(
+                fields=('status', 'run_after'), name='job_status_run_after_idx'
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.kind} #{self.pk} ({self.status})'
+
+    def report_progress(self, done, total=None):
+        """Сохраняет прогресс одним UPDATE, не трогая остальные поля."""
+        self.progress_done = done
+        if total is not None:
+            self.progress_total = total
+        Job.objects.filter(pk=self.pk).update(
+            progress_done=self.progress_done,
+            progress_total=self.progress_total,
+            updated_at=timezone.now(),
+        )
+
+
+class Blob(models.Model):
+    """Содержимое файла, хранимое один раз по SHA-256."""
+
+    sha256 = models.CharField('SHA-256', max_length=64, unique=True)
+    size = models.PositiveBigIntegerField('Размер')
+    created_at = models.DateTimeField('Загружен', auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'файл'
+        verbose_name_plural = 'файлы'
+
+    def __str__(self):
+        return self.sha256
+
+    @property
+    def relative_path(self):
+        return f'{self.sha256[:2]}/{self.sha256[2:4]}/{self.sha256}'
+
+    @property
+    def path(self):
+        return Path(settings.NOTES_ATTACHMENTS_ROOT) / 'blobs' / (
+            self.relative_path
+        )
+
+
+class Attachment(models.Model):
+    note = models.ForeignKey(
+        Note,
+        on_delete=models.CASCADE,
+        related_name='attachments',
+    )
+    blob = models.ForeignKey(Blob, on_delete=models.PROTECT)
+    name = models.CharField('Имя файла', max_length=255)
+    content_type = models.CharField(
+        'Тип содержимого',
+        max_length=100,
+        default='application/octet-stream',
+    )
+    uploaded_at = models.DateTimeField('Загружен', auto_now_add=True)
+
+    class Meta:
+        ordering = ('pk',)
+        verbose_name = 'вложение'
+        verbose_name_plural = 'вложения'
+
+    def __str__(self):
+        return self.name
+
+
+class Upload(models.Model):
+    """Незавершённая докачиваемая загрузка вложения."""
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4)
+    note = models.ForeignKey(
+        Note,
+        on_delete=models.CASCADE,
+        related_name='uploads',
+    )
+    name = models.CharField('Имя файла', max_length=255)
+    content_type = models.CharField(
+        'Тип содержимого',
+        max_length=100,
+        default='application/octet-stream',
+    )
+    size = models.PositiveBigIntegerField('Размер')
+    received = models.PositiveBigIntegerField('Получено', default=0)
+    created_at = models.DateTimeField('Начата', auto_now_add=True)
+
+    def __str__(self):
+        return f'{self.name} ({self.received}/{self.size})'
+
+    @property
+    def path(self):
+        return Path(settings.NOTES_ATTACHMENTS_ROOT) / 'uploads' / (
+            f'{self.pk}.part'
+        )
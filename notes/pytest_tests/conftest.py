@@ -1,9 +1,29 @@
 import pytest
 
+from django.core.cache import cache
 from django.test.client import Client
 from notes.models import Note
 
 
+@pytest.fixture(autouse=True)
+def clear_cache():
+    # Корзины ограничения частоты не должны переходить между тестами.
+    cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def strict_query_budget(settings):
+    # В тестах превышение бюджета SQL-запросов — ошибка, а не запись в лог.
+    settings.NOTES_QUERY_BUDGET_RAISE = True
+
+
+@pytest.fixture(autouse=True)
+def share_root(settings, tmp_path):
+    # Снимки публичных ссылок пишутся во временный каталог теста.
+    settings.NOTES_SHARE_ROOT = tmp_path / "shared"
+    return settings.NOTES_SHARE_ROOT
+
+
 @pytest.fixture
 def author(django_user_model):
     return django_user_model.objects.create(username="Автор")
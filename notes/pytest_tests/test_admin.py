@@ -0,0 +1,72 @@
+import pytest
+
+from django.urls import reverse
+
+from notes.models import Note, Tag, UserStats
+from notes.paginators import EstimatedCountPaginator
+
+
+@pytest.fixture
+def many_notes(author):
+    return Note.objects.bulk_create(
+        Note(title=f"Заметка {number}", text="Текст", slug=f"note-{number}",
+             author=author)
+        for number in range(30)
+    )
+
+
+def test_changelist_has_no_full_count(
+    admin_client, many_notes, django_assert_max_num_queries
+):
+    url = reverse("admin:notes_note_changelist")
+    with django_assert_max_num_queries(8) as captured:
+        response = admin_client.get(url)
+    assert response.status_code == 200
+    assert not any(
+        "COUNT(*)" in query["sql"] and "notes_note" in query["sql"]
+        for query in captured.captured_queries
+    )
+
+
+def test_change_form_uses_raw_id_author(admin_client, note):
+    url = reverse("admin:notes_note_change", args=(note.pk,))
+    response = admin_client.get(url)
+    assert "vForeignKeyRawIdAdminField" in response.content.decode()
+
+
+def test_search_by_exact_slug(admin_client, many_notes):
+    url = reverse("admin:notes_note_changelist")
+    response = admin_client.get(url, {"q": "note-7"})
+    assert [note.slug for note in response.context["cl"].result_list] == [
+        "note-7"
+    ]
+
+
+def test_estimated_paginator_counts_filtered_exactly(many_notes):
+    # После удаления оценка по максимальному pk расходится с COUNT(*).
+    Note.all_objects.filter(
+        pk__in=[note.pk for note in many_notes[:5]]
+    ).delete()
+    queryset = Note.all_objects.order_by("pk")
+    assert queryset.count() == 25
+    assert EstimatedCountPaginator(queryset, 10).count == many_notes[-1].pk
+    assert EstimatedCountPaginator(
+        queryset.filter(slug="note-10"), 10
+    ).count == 1
+
+
+def test_bulk_actions(admin_client, author, many_notes):
+    url = reverse("admin:notes_note_changelist")
+    many_notes[0].set_tags({"тег"})
+    selected = [note.pk for note in many_notes[:2]]
+    admin_client.post(
+        url, {"action": "clear_tags", "_selected_action": selected}
+    )
+    assert Tag.objects.get().notes_count == 0
+
+    admin_client.post(
+        url, {"action": "trash_notes", "_selected_action": selected}
+    )
+    assert Note.objects.count() == 28
+    assert Note.all_objects.count() == 30
+    assert UserStats.objects.get(pk=author.pk).notes_count == 28
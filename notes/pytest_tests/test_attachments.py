@@ -0,0 +1,208 @@
+from datetime import timedelta
+from http import HTTPStatus
+from io import StringIO
+
+import pytest
+
+from django.core.management import call_command
+from django.db.models import ProtectedError
+from django.urls import reverse
+from django.utils import timezone
+
+from notes import attachments
+from notes.models import Attachment, Blob, Upload
+
+CONTENT = bytes(range(256)) * 10
+
+
+@pytest.fixture(autouse=True)
+def attachments_root(settings, tmp_path):
+    settings.NOTES_ATTACHMENTS_ROOT = tmp_path
+    return tmp_path
+
+
+def upload_file(client, note, content=CONTENT, name="file.bin", chunk=1000):
+    response = client.post(
+        reverse("notes:attachment_upload", args=(note.slug,)),
+        {"name": name, "size": len(content), "content_type": "text/plain"},
+    )
+    assert response.status_code == HTTPStatus.CREATED
+    url = response.json()["url"]
+    for start in range(0, len(content), chunk):
+        part = content[start:start + chunk]
+        response = client.put(
+            url,
+            part,
+            content_type="application/octet-stream",
+            headers={
+                "Content-Range":
+                    f"bytes {start}-{start + len(part) - 1}/{len(content)}"
+            },
+        )
+    return url, response
+
+
+def test_chunked_upload_creates_attachment(author_client, note):
+    _, response = upload_file(author_client, note)
+    assert response.status_code == HTTPStatus.CREATED
+    attachment = Attachment.objects.get()
+    assert attachment.blob.path.read_bytes() == CONTENT
+    assert not Upload.objects.exists()
+
+
+def test_upload_can_resume(author_client, note):
+    response = author_client.post(
+        reverse("notes:attachment_upload", args=(note.slug,)),
+        {"name": "file.bin", "size": len(CONTENT)},
+    )
+    url = response.json()["url"]
+    author_client.put(
+        url, CONTENT[:1000], content_type="application/octet-stream",
+        headers={"Content-Range": f"bytes 0-999/{len(CONTENT)}"},
+    )
+    response = author_client.put(
+        url, CONTENT[2000:], content_type="application/octet-stream",
+        headers={"Content-Range": f"bytes 2000-2559/{len(CONTENT)}"},
+    )
+    assert response.status_code == HTTPStatus.CONFLICT
+    assert author_client.get(url).json()["offset"] == 1000
+    response = author_client.put(
+        url, CONTENT[1000:], content_type="application/octet-stream",
+        headers={"Content-Range": f"bytes 1000-2559/{len(CONTENT)}"},
+    )
+    assert response.status_code == HTTPStatus.CREATED
+
+
+def test_identical_files_are_stored_once(author_client, note):
+    upload_file(author_client, note, name="first.bin")
+    upload_file(author_client, note, name="second.bin")
+    assert Attachment.objects.count() == 2
+    assert Blob.objects.count() == 1
+
+
+def test_download_full_and_conditional(author_client, note):
+    upload_file(author_client, note)
+    attachment = Attachment.objects.get()
+    url = reverse("notes:attachment", args=(note.slug, attachment.pk))
+    response = author_client.get(url)
+    assert response.status_code == HTTPStatus.OK
+    assert b"".join(response.streaming_content) == CONTENT
+    assert response["Accept-Ranges"] == "bytes"
+    response = author_client.get(
+        url, headers={"If-None-Match": response["ETag"]}
+    )
+    assert response.status_code == HTTPStatus.NOT_MODIFIED
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    (
+        ("bytes=10-19", CONTENT[10:20]),
+        ("bytes=2550-", CONTENT[2550:]),
+        ("bytes=-5", CONTENT[-5:]),
+    ),
+)
+def test_download_range(author_client, note, header, expected):
+    upload_file(author_client, note)
+    attachment = Attachment.objects.get()
+    url = reverse("notes:attachment", args=(note.slug, attachment.pk))
+    response = author_client.get(url, headers={"Range": header})
+    assert response.status_code == HTTPStatus.PARTIAL_CONTENT
+    assert b"".join(response.streaming_content) == expected
+    assert response["Content-Length"] == str(len(expected))
+    assert response["Content-Range"].endswith(f"/{len(CONTENT)}")
+
+
+def test_unsatisfiable_range(author_client, note):
+    upload_file(author_client, note)
+    attachment = Attachment.objects.get()
+    url = reverse("notes:attachment", args=(note.slug, attachment.pk))
+    response = author_client.get(url, headers={"Range": "bytes=9999-"})
+    assert response.status_code == HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE
+
+
+def test_sendfile_header(author_client, note, settings):
+    settings.NOTES_SENDFILE_HEADER = "X-Accel-Redirect"
+    upload_file(author_client, note)
+    attachment = Attachment.objects.get()
+    url = reverse("notes:attachment", args=(note.slug, attachment.pk))
+    response = author_client.get(url)
+    assert response["X-Accel-Redirect"].endswith(attachment.blob.sha256)
+    assert not response.content
+
+
+def test_attachments_are_scoped_to_author(
+    author_client, not_author_client, note
+):
+    upload_url, _ = upload_file(author_client, note)
+    attachment = Attachment.objects.get()
+    url = reverse("notes:attachment", args=(note.slug, attachment.pk))
+    assert not_author_client.get(url).status_code == HTTPStatus.NOT_FOUND
+    response = not_author_client.post(
+        reverse("notes:attachment_upload", args=(note.slug,)),
+        {"name": "x", "size": 1},
+    )
+    assert response.status_code == HTTPStatus.NOT_FOUND
+
+
+def test_delete_orphan_blobs(author_client, note):
+    upload_file(author_client, note)
+    blob = Blob.objects.get()
+    Attachment.objects.all().delete()
+    assert attachments.delete_orphan_blobs() == 1
+    assert not blob.path.exists()
+
+
+def test_orphan_sweep_spares_file_reuploaded_meanwhile(
+    author_client, note, monkeypatch
+):
+    upload_file(author_client, note)
+    blob = Blob.objects.get()
+    Attachment.objects.all().delete()
+    delete = Blob.delete
+
+    def delete_then_reupload(self, *args, **kwargs):
+        result = delete(self, *args, **kwargs)
+        # complete() не нашёл строку и положил тот же файл заново.
+        assert not self.path.exists()
+        self.path.write_bytes(CONTENT)
+        return result
+
+    monkeypatch.setattr(Blob, "delete", delete_then_reupload)
+    assert attachments.delete_orphan_blobs() == 1
+    assert blob.path.read_bytes() == CONTENT
+    assert not list(blob.path.parent.glob("*.deleting"))
+
+
+def test_orphan_sweep_restores_reattached_file(
+    author_client, note, monkeypatch
+):
+    upload_file(author_client, note)
+    blob = Blob.objects.get()
+    Attachment.objects.all().delete()
+
+    def protected(self, *args, **kwargs):
+        raise ProtectedError("вложение", set())
+
+    monkeypatch.setattr(Blob, "delete", protected)
+    assert attachments.delete_orphan_blobs() == 0
+    assert blob.path.read_bytes() == CONTENT
+
+
+def test_clean_attachments_removes_stale_uploads(note):
+    stale, fresh = (
+        Upload.objects.create(note=note, name=name, size=len(CONTENT))
+        for name in ("stale.bin", "fresh.bin")
+    )
+    for upload in (stale, fresh):
+        upload.path.parent.mkdir(parents=True, exist_ok=True)
+        upload.path.write_bytes(CONTENT[:100])
+    Upload.objects.filter(pk=stale.pk).update(
+        created_at=timezone.now() - timedelta(days=8)
+    )
+    out = StringIO()
+    call_command("clean_attachments", stdout=out)
+    assert "брошенных загрузок: 1" in out.getvalue()
+    assert list(Upload.objects.all()) == [fresh]
+    assert not stale.path.exists()
+    assert fresh.path.exists()
@@ -0,0 +1,48 @@
+from django.urls import reverse
+
+from notes.models import Note, normalize_title
+
+
+def test_normalize_title():
+    assert normalize_title("  Щука   Ёж ") == "schuka yozh"
+    assert normalize_title("Café") == "café"
+
+
+def test_autocomplete_by_prefix(author_client, author, not_author):
+    Note.objects.bulk_create([
+        Note(title="Список покупок", text="т", slug="shopping", author=author),
+        Note(title="список дел", text="т", slug="todo", author=author),
+        Note(title="Спорт", text="т", slug="sport", author=author),
+        Note(title="Список", text="т", slug="foreign", author=not_author),
+    ])
+    response = author_client.get(reverse("notes:autocomplete"), {"q": "СПИС"})
+    assert [item["slug"] for item in response.json()["results"]] == [
+        "todo", "shopping"
+    ]
+    assert "private" in response["Cache-Control"]
+    assert "max-age=30" in response["Cache-Control"]
+
+
+def test_autocomplete_accepts_transliterated_prefix(author_client, note):
+    response = author_client.get(
+        reverse("notes:autocomplete"), {"q": normalize_title(note.title)[:3]}
+    )
+    assert response.json()["results"] == [
+        {"title": note.title, "slug": note.slug}
+    ]
+
+
+def test_autocomplete_uses_range_not_like(
+    author_client, note, django_assert_max_num_queries
+):
+    with django_assert_max_num_queries(3) as captured:
+        author_client.get(reverse("notes:autocomplete"), {"q": "за"})
+    sql = captured.captured_queries[-1]["sql"]
+    assert "LIKE" not in sql
+    assert '"title_key" >=' in sql
+
+
+def test_title_key_follows_edits(author_client, note, form_data):
+    author_client.post(reverse("notes:edit", args=(note.slug,)), form_data)
+    note.refresh_from_db()
+    assert note.title_key == normalize_title(form_data["title"])
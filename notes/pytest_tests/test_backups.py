@@ -0,0 +1,153 @@
+import sqlite3
+from io import StringIO
+
+import pytest
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import transaction
+
+from notes import backups
+from notes.models import Note, UserStats
+
+# Онлайн-копия читает базу вне транзакции теста.
+pytestmark = pytest.mark.django_db(transaction=True)
+
+
+@pytest.fixture
+def tagged_note(note):
+    note.set_tags({"работа", "идеи"})
+    return note
+
+
+def test_backup_copies_live_database(tagged_note, tmp_path):
+    out = StringIO()
+    call_command("backup", output_dir=tmp_path, pages=1, sleep=0, stdout=out)
+    [path] = tmp_path.glob(backups.BACKUP_PATTERN)
+    assert "Проверка пройдена" in out.getvalue()
+    assert backups.verify(path) == {"notes.Note": 1, "auth.User": 1}
+    assert not list(tmp_path.glob("*.part"))
+
+
+def test_backup_pauses_between_steps(tagged_note, tmp_path, monkeypatch):
+    pauses = []
+    steps = []
+    monkeypatch.setattr(backups.time, "sleep", pauses.append)
+    backups.backup(
+        tmp_path / "copy.sqlite3", pages=1, sleep=0.01,
+        progress=lambda remaining, total: steps.append(remaining),
+    )
+    assert len(steps) > 1
+    assert pauses == [0.01] * (len(steps) - 1)
+
+
+def test_verify_rejects_corrupted_backup(tmp_path):
+    path = tmp_path / "notes-broken.sqlite3"
+    path.write_bytes(b"not a database" * 100)
+    with pytest.raises(backups.BackupError):
+        backups.verify(path)
+    with pytest.raises(CommandError):
+        call_command("backup", check=path, stdout=StringIO())
+
+
+def test_rotate_keeps_newest(tmp_path):
+    for day in range(1, 6):
+        (tmp_path / f"notes-2026010{day}-000000.sqlite3").touch()
+    removed = backups.rotate(tmp_path, 2)
+    assert len(removed) == 3
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        "notes-20260104-000000.sqlite3",
+        "notes-20260105-000000.sqlite3",
+    ]
+
+
+def test_export_author(tagged_note, not_author, tmp_path):
+    Note.objects.create(title="Чужая", text="Текст", author=not_author)
+    call_command(
+        "backup", output_dir=tmp_path, author=[tagged_note.author.username],
+        stdout=StringIO(),
+    )
+    [path] = tmp_path.glob("*.jsonl")
+    assert list(backups.read_export(path)) == [{
+        "slug": tagged_note.slug,
+        "title": tagged_note.title,
+        "text": tagged_note.text,
+        "tags": ["идеи", "работа"],
+    }]
+
+
+def test_restore_from_export(tagged_note, tmp_path):
+    path = tmp_path / "export.jsonl"
+    with open(path, "w", encoding="utf-8") as stream:
+        backups.export_author(tagged_note.author, stream)
+    tagged_note.text = "Испорченный текст"
+    tagged_note.save()
+    tagged_note.set_tags({"мусор"})
+    Note.objects.create(
+        title="Лишняя", text="Текст", author=tagged_note.author
+    )
+    call_command(
+        "restore_notes", path, tagged_note.author.username, replace=True,
+        stdout=StringIO(),
+    )
+    restored = Note.objects.get(author=tagged_note.author)
+    assert restored.text == "Текст заметки"
+    assert set(restored.tags.values_list("name", flat=True)) == {
+        "работа", "идеи"
+    }
+    stats = UserStats.objects.get(pk=tagged_note.author_id)
+    assert (stats.notes_count, stats.chars_count) == (1, len(restored.text))
+
+
+def test_restore_from_backup(tagged_note, not_author, tmp_path):
+    path = tmp_path / "notes.sqlite3"
+    backups.backup(path)
+    Note.objects.all().delete()
+    Note.objects.create(
+        title="Чужая", text="Текст", slug="taken", author=not_author
+    )
+    result = backups.restore_author(
+        tagged_note.author,
+        backups.read_backup(path, tagged_note.author.username)
+        + [{"slug": "taken", "title": "Моя", "text": "", "tags": []}],
+    )
+    assert result["created"] == 1
+    assert result["skipped"] == ["taken"]
+    restored = Note.objects.get(author=tagged_note.author)
+    assert restored.slug == tagged_note.slug
+    assert restored.tags.count() == 2
+
+
+def test_backup_does_not_hold_database(note, tmp_path):
+    path = tmp_path / "notes.sqlite3"
+    steps = []
+    backups.backup(
+        path, pages=1, sleep=0,
+        progress=lambda remaining, total: steps.append(remaining),
+    )
+    assert len(steps) > 1
+    with sqlite3.connect(path) as copy:
+        assert copy.execute("PRAGMA integrity_check").fetchone() == ("ok",)
+
+
+def test_backup_refuses_open_transaction(tmp_path):
+    with transaction.atomic():
+        with pytest.raises(backups.BackupError):
+            backups.backup(tmp_path / "notes.sqlite3")
+
+
+def test_restore_skips_invalid_records(author):
+    result = backups.restore_author(author, [
+        {"slug": "bad slug/..", "title": "Заголовок", "text": "Текст"},
+        {"slug": "long", "title": "Т" * 500, "text": "Текст"},
+        {"slug": "no-text", "title": "Заголовок"},
+        {"slug": "long-tag", "title": "Т", "text": "Текст",
+         "tags": ["т" * 51]},
+        {"slug": "good", "title": "Заголовок", "text": "Текст",
+         "tags": [" Архив ", "архив"]},
+    ])
+    assert result["created"] == 1
+    assert result["skipped"] == ["bad slug/..", "long", "long-tag", "no-text"]
+    note = Note.objects.get(author=author)
+    assert note.slug == "good"
+    assert list(note.tags.values_list("name", flat=True)) == ["архив"]
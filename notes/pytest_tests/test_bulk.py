@@ -0,0 +1,147 @@
+import json
+from http import HTTPStatus
+
+import pytest
+
+from django.urls import reverse
+from django.utils.http import urlencode
+
+from notes import jobs
+from notes.models import Job, Note, Tag, UserStats
+
+BULK_URL = reverse("notes:bulk")
+
+
+@pytest.fixture
+def many_notes(author):
+    return Note.objects.bulk_create(
+        Note(title=f"Заметка {i}", text="Текст", slug=f"n{i}", author=author)
+        for i in range(50)
+    )
+
+
+@pytest.fixture
+def foreign_note(not_author):
+    return Note.objects.create(
+        title="Чужая", text="Текст", slug="foreign", author=not_author
+    )
+
+
+def test_list_renders_bulk_form(author_client, note):
+    response = author_client.get(reverse("notes:list"))
+    assert "bulk_form" in response.context
+    assert f'name="notes" value="{note.pk}"'.encode() in response.content
+
+
+def test_bulk_delete_selected(author_client, many_notes, foreign_note):
+    selected = [note.pk for note in many_notes[:10]] + [foreign_note.pk]
+    response = author_client.post(
+        BULK_URL, {"action": "delete", "notes": selected}
+    )
+    assert response.status_code == HTTPStatus.FOUND
+    assert Note.objects.filter(author=many_notes[0].author).count() == 40
+    assert Note.objects.filter(pk=foreign_note.pk).exists()
+    assert UserStats.objects.get(pk=many_notes[0].author_id).notes_count == 40
+
+
+def test_bulk_delete_all_is_set_based(
+    author_client, many_notes, foreign_note, django_assert_max_num_queries
+):
+    with django_assert_max_num_queries(15):
+        response = author_client.post(
+            BULK_URL, {"action": "delete", "all_notes": "on"}
+        )
+    assert response.status_code == HTTPStatus.FOUND
+    assert not Note.objects.filter(author=many_notes[0].author).exists()
+    assert Note.all_objects.filter(author=many_notes[0].author).count() == 50
+    assert Note.objects.filter(pk=foreign_note.pk).exists()
+
+
+def test_bulk_all_respects_tag_filter(author_client, many_notes):
+    Note.objects.filter(pk__in=[note.pk for note in many_notes[:5]]).add_tags(
+        {"работа"}
+    )
+    response = author_client.post(
+        BULK_URL, {"action": "delete", "all_notes": "on", "tag": "работа"}
+    )
+    assert response.url == reverse("notes:list") + "?" + urlencode(
+        {"tag": "работа"}
+    )
+    assert Note.objects.count() == 45
+    assert Tag.objects.get(name="работа").notes_count == 0
+
+
+def test_bulk_tag(
+    author_client, many_notes, foreign_note, django_assert_max_num_queries
+):
+    with django_assert_max_num_queries(15):
+        author_client.post(BULK_URL, {
+            "action": "tag",
+            "all_notes": "on",
+            "tags": "Работа, идеи",
+        })
+    author = many_notes[0].author
+    assert dict(
+        Tag.objects.filter(author=author).values_list("name", "notes_count")
+    ) == {"работа": 50, "идеи": 50}
+    assert not foreign_note.tags.exists()
+    # Повтор не создаёт дубликатов связей.
+    author_client.post(BULK_URL, {
+        "action": "tag", "notes": [many_notes[0].pk], "tags": "работа",
+    })
+    assert Tag.objects.get(author=author, name="работа").notes_count == 50
+
+
+def test_bulk_export_runs_in_background(
+    author_client, not_author_client, many_notes, foreign_note, settings,
+    tmp_path,
+):
+    settings.NOTES_EXPORT_DIR = tmp_path
+    response = author_client.post(BULK_URL, {
+        "action": "export",
+        "notes": [many_notes[0].pk, many_notes[1].pk, foreign_note.pk],
+    })
+    assert response.status_code == HTTPStatus.FOUND
+    job = Job.objects.get(kind="export_notes")
+    url = reverse("notes:job_download", args=(job.pk,))
+    # Пока задача не выполнена, файла нет.
+    assert author_client.get(url).status_code == HTTPStatus.NOT_FOUND
+    jobs.work("обработчик", once=True)
+    job.refresh_from_db()
+    assert job.result == {"exported": 2}
+    assert not_author_client.get(url).status_code == HTTPStatus.NOT_FOUND
+    response = author_client.get(url)
+    assert response["Content-Disposition"].startswith("attachment")
+    lines = b"".join(response.streaming_content).decode().splitlines()
+    assert [json.loads(line)["slug"] for line in lines] == ["n0", "n1"]
+
+
+def test_bulk_export_all_by_tag_filter(
+    author_client, many_notes, settings, tmp_path
+):
+    settings.NOTES_EXPORT_DIR = tmp_path
+    Note.objects.filter(pk__in=[note.pk for note in many_notes[:3]]).add_tags(
+        {"работа"}
+    )
+    author_client.post(BULK_URL, {
+        "action": "export", "all_notes": "on", "tag": ["работа"],
+    })
+    assert Job.objects.get().payload == {"tags": ["работа"]}
+    jobs.work("обработчик", once=True)
+    assert Job.objects.get().result == {"exported": 3}
+
+
+@pytest.mark.parametrize(
+    "data",
+    (
+        {"action": "delete"},
+        {"action": "tag", "all_notes": "on"},
+        {"action": "delete", "notes": ["abc"]},
+        {"action": "drop", "all_notes": "on"},
+    ),
+)
+def test_bulk_invalid_request_changes_nothing(author_client, note, data):
+    response = author_client.post(BULK_URL, data, follow=True)
+    assert list(response.context["messages"])
+    assert Note.objects.count() == 1
+    assert not note.tags.exists()
@@ -0,0 +1,84 @@
+import pytest
+
+from django.core.management import call_command
+from django.urls import reverse
+
+from notes import similarity
+from notes.models import Note
+
+TEXT = (
+    "Купить молоко хлеб и сыр по дороге домой после работы, "
+    "не забыть зайти в аптеку за витаминами"
+)
+
+
+@pytest.fixture
+def original(author):
+    return Note.objects.create(
+        title="Покупки", text=TEXT, slug="shopping", author=author
+    )
+
+
+def test_similar_texts_share_a_band():
+    original = similarity.bands(TEXT)
+    edited = similarity.bands(TEXT.replace("сыр", "сыра"))
+    other = similarity.bands("Совершенно другой текст про отпуск и море")
+    assert any(first == second for first, second in zip(original, edited))
+    assert not any(first == second for first, second in zip(original, other))
+
+
+def test_jaccard_threshold():
+    original = similarity.shingles(TEXT)
+    assert similarity.jaccard(
+        original, similarity.shingles(TEXT + " сегодня")
+    ) >= similarity.THRESHOLD
+    assert similarity.jaccard(
+        original, similarity.shingles("Купить хлеб")
+    ) < similarity.THRESHOLD
+
+
+def test_near_duplicates_are_scoped_by_author(original, author, not_author):
+    copy = Note.objects.create(
+        title="Покупки", text=TEXT, slug="copy", author=author
+    )
+    Note.objects.create(
+        title="Покупки", text=TEXT, slug="foreign", author=not_author
+    )
+    Note.objects.create(
+        title="Отпуск", text="Взять палатку", slug="trip", author=author
+    )
+    assert Note.objects.near_duplicates(original) == [copy]
+
+
+def test_create_warns_about_duplicates(author_client, original):
+    response = author_client.post(
+        reverse("notes:add"),
+        {"title": "Покупки", "text": TEXT, "slug": "again"},
+        follow=True,
+    )
+    assert "похожа на уже существующие" in response.content.decode()
+
+
+def test_duplicates_view(author_client, not_author_client, original):
+    Note.objects.create(
+        title="Покупки", text=TEXT, slug="copy", author=original.author
+    )
+    url = reverse("notes:duplicates", args=(original.slug,))
+    response = author_client.get(url)
+    assert [note.slug for note in response.context["duplicates"]] == ["copy"]
+    assert not_author_client.get(url).status_code == 404
+
+
+def test_fingerprint_command_backfills(original):
+    Note._base_manager.filter(pk=original.pk).update(
+        fp_band_0=None, fp_band_1=None, fp_band_2=None, fp_band_3=None
+    )
+    call_command("fingerprint_notes", batch_size=1)
+    original.refresh_from_db()
+    assert [
+        original.fp_band_0,
+        original.fp_band_1,
+        original.fp_band_2,
+        original.fp_band_3,
+    ] == similarity.bands(f"{original.title}\n{original.text}")
+    assert original.version == 1
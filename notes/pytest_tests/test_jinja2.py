@@ -0,0 +1,158 @@
+import html
+import re
+
+import pytest
+
+from django.conf import settings as django_settings
+from django.contrib import messages
+from django.contrib.messages.storage.fallback import FallbackStorage
+from django.template.backends.django import DjangoTemplates
+from django.template.backends.jinja2 import Jinja2
+from django.template.loader import get_template, render_to_string
+from django.urls import reverse
+from pytest_lazy_fixtures import lf
+
+from benchmarks.rendering import build_context, build_engines, measure
+from notes import sharing
+from notes.models import Note
+
+CSRF_RE = re.compile(
+    r'(name="csrfmiddlewaretoken" value|data-csrf)="[^"]*"'
+)
+
+
+def normalize(content):
+    """HTML без различий в пробелах, способе экранирования и csrf-токене."""
+    content = CSRF_RE.sub("", content.decode())
+    return " ".join(html.unescape(content).split()).replace("> <", "><")
+
+
+@pytest.fixture
+def rich_note(note, author):
+    note.set_tags({"работа", "идеи & планы"})
+    Note.objects.create(
+        title=note.title, text=note.text, slug="copy", author=author
+    )
+    Note.objects.create(
+        title="В корзине", text="Текст", slug="trashed", author=author
+    ).trash()
+    return note
+
+
+@pytest.fixture
+def use_jinja2(settings):
+    def switch():
+        settings.TEMPLATES = [
+            django_settings.JINJA2_TEMPLATES,
+            django_settings.DJANGO_TEMPLATES,
+        ]
+    return switch
+
+
+def test_engine_is_switchable(use_jinja2):
+    use_jinja2()
+    assert isinstance(get_template("notes/list.html").backend, Jinja2)
+    assert isinstance(
+        get_template("registration/login.html").backend, DjangoTemplates
+    )
+
+
+@pytest.mark.parametrize(
+    "parametrized_client, name, args, query",
+    (
+        (lf("client"), "notes:home", None, {}),
+        (lf("author_client"), "notes:home", None, {}),
+        (lf("author_client"), "notes:list", None, {}),
+        (lf("author_client"), "notes:list", None, {"tag": "работа"}),
+        (lf("author_client"), "notes:add", None, {}),
+        (lf("author_client"), "notes:edit", lf("slug_for_args"), {}),
+        (lf("author_client"), "notes:detail", lf("slug_for_args"), {}),
+        (lf("author_client"), "notes:delete", lf("slug_for_args"), {}),
+        (lf("author_client"), "notes:duplicates", lf("slug_for_args"), {}),
+        (lf("author_client"), "notes:success", None, {}),
+        (lf("author_client"), "notes:trash", None, {}),
+    ),
+)
+def test_engines_render_equivalent_html(
+    rich_note, use_jinja2, parametrized_client, name, args, query
+):
+    url = reverse(name, args=args)
+    expected = parametrized_client.get(url, query)
+    use_jinja2()
+    response = parametrized_client.get(url, query)
+    assert normalize(response.content) == normalize(expected.content)
+
+
+def test_engines_render_equivalent_form_errors(
+    author_client, rich_note, use_jinja2, form_data
+):
+    url = reverse("notes:add")
+    form_data["slug"] = rich_note.slug
+    expected = author_client.post(url, form_data)
+    use_jinja2()
+    response = author_client.post(url, form_data)
+    assert normalize(response.content) == normalize(expected.content)
+
+
+def test_engines_render_equivalent_shared_note(
+    author_client, rich_note, use_jinja2
+):
+    rich_note.share()
+    url = reverse("notes:detail", args=(rich_note.slug,))
+    expected_page = author_client.get(url).content
+    # Хеш в первой строке снимка зависит от пробелов шаблона.
+    expected_snapshot = sharing.render(rich_note)[sharing.HEADER_LENGTH:]
+    use_jinja2()
+    assert normalize(author_client.get(url).content) == normalize(
+        expected_page
+    )
+    snapshot = sharing.render(rich_note)[sharing.HEADER_LENGTH:]
+    assert normalize(snapshot) == normalize(
+        expected_snapshot
+    )
+
+
+def test_jinja2_escapes_user_content(author_client, author, use_jinja2):
+    note = Note.objects.create(
+        title="<script>alert(1)</script>", text="т", slug="xss", author=author
+    )
+    use_jinja2()
+    response = author_client.get(reverse("notes:detail", args=(note.slug,)))
+    assert "<script>alert(1)</script>" not in response.content.decode()
+    assert "&lt;script&gt;" in response.content.decode()
+
+
+def test_jinja2_renders_messages(rf, author, use_jinja2):
+    use_jinja2()
+    request = rf.get("/")
+    request.user = author
+    request.session = {}
+    request._messages = FallbackStorage(request)
+    messages.warning(request, "Осторожно")
+    content = render_to_string("notes/home.html", request=request)
+    assert 'class="alert alert-warning"' in content
+    assert "Осторожно" in content
+
+
+@pytest.mark.parametrize(
+    "name, query",
+    (("notes:list", {"all": 1}), ("notes:detail", {})),
+)
+def test_engines_stream_equivalent_html(
+    rich_note, author_client, use_jinja2, settings, name, query
+):
+    settings.NOTES_STREAM_MIN_TEXT = 1
+    args = (rich_note.slug,) if name == "notes:detail" else None
+    url = reverse(name, args=args)
+    expected = b"".join(author_client.get(url, query).streaming_content)
+    use_jinja2()
+    response = author_client.get(url, query)
+    assert normalize(b"".join(response.streaming_content)) == normalize(
+        expected
+    )
+
+
+def test_rendering_benchmark_runs():
+    context = build_context(3)
+    for name, engine in build_engines().items():
+        assert measure(engine, context, runs=1) > 0, name
@@ -0,0 +1,172 @@
+import json
+from datetime import timedelta
+
+import pytest
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.conf import settings
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+
+from notes import jobs
+from notes.models import Job, Note, UserStats
+
+pytestmark = pytest.mark.django_db
+
+
+def expired_at():
+    return timezone.now() - timedelta(seconds=settings.NOTES_JOB_LEASE + 1)
+
+
+@pytest.fixture
+def failing_handler():
+    calls = []
+
+    @jobs.register("test_failing")
+    def handler(job):
+        calls.append(job.pk)
+        raise RuntimeError("сбой")
+
+    yield calls
+    del jobs.HANDLERS["test_failing"]
+
+
+def test_enqueue_unknown_kind():
+    with pytest.raises(ValueError):
+        jobs.enqueue("нет-такого")
+
+
+def test_claim_is_exclusive():
+    job = jobs.enqueue("recount_tags")
+    assert jobs.claim("первый").pk == job.pk
+    assert jobs.claim("второй") is None
+    job.refresh_from_db()
+    assert (job.status, job.locked_by) == (Job.Status.RUNNING, "первый")
+
+
+def test_claim_skips_delayed_and_reclaims_stale():
+    delayed = jobs.enqueue("recount_tags")
+    Job.objects.filter(pk=delayed.pk).update(
+        run_after=timezone.now() + timedelta(hours=1)
+    )
+    assert jobs.claim("обработчик") is None
+    stale = jobs.enqueue("recount_tags")
+    Job.objects.filter(pk=stale.pk).update(
+        status=Job.Status.RUNNING,
+        locked_at=expired_at(),
+    )
+    assert jobs.claim("обработчик").pk == stale.pk
+
+
+def test_stale_job_is_reclaimed_once():
+    job = jobs.enqueue("recount_tags")
+    stale_at = expired_at()
+    Job.objects.filter(pk=job.pk).update(
+        status=Job.Status.RUNNING, locked_by="зависший", locked_at=stale_at
+    )
+    # Оба обработчика прочитали одну и ту же задачу с истёкшей арендой.
+    now = timezone.now()
+    assert jobs.lock(job.pk, Job.Status.RUNNING, stale_at, "первый", now)
+    assert not jobs.lock(
+        job.pk, Job.Status.RUNNING, stale_at, "второй", now
+    )
+    job.refresh_from_db()
+    assert job.locked_by == "первый"
+
+
+def test_expired_owner_does_not_overwrite_new_owner():
+    jobs.enqueue("recount_tags")
+    expired = jobs.claim("первый")
+    Job.objects.filter(pk=expired.pk).update(
+        locked_at=expired_at()
+    )
+    assert jobs.claim("второй").pk == expired.pk
+    jobs.run(expired)
+    expired.refresh_from_db()
+    assert (expired.status, expired.locked_by) == (
+        Job.Status.RUNNING, "второй"
+    )
+
+
+def test_job_that_kills_worker_fails_after_max_attempts():
+    job = jobs.enqueue("recount_tags", max_attempts=2)
+    for number in range(2):
+        # Обработчик погиб, не записав итог: срок аренды истекает.
+        assert jobs.claim(f"обработчик-{number}").pk == job.pk
+        Job.objects.filter(pk=job.pk).update(
+            locked_at=expired_at()
+        )
+    assert jobs.claim("обработчик") is None
+    job.refresh_from_db()
+    assert (job.status, job.attempts) == (Job.Status.FAILED, 2)
+    assert job.error
+
+
+def test_retry_with_backoff_then_fail(failing_handler):
+    job = jobs.enqueue("test_failing", max_attempts=2)
+    jobs.run(jobs.claim("обработчик"))
+    job.refresh_from_db()
+    assert job.status == Job.Status.QUEUED
+    assert job.attempts == 1
+    assert job.run_after > timezone.now() + timedelta(
+        seconds=jobs.backoff(1) - 5
+    )
+    Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+    jobs.run(jobs.claim("обработчик"))
+    job.refresh_from_db()
+    assert job.status == Job.Status.FAILED
+    assert "RuntimeError" in job.error
+    assert len(failing_handler) == 2
+
+
+def test_backoff_is_exponential_and_bounded(settings):
+    settings.NOTES_JOB_BACKOFF_BASE = 3
+    settings.NOTES_JOB_BACKOFF_MAX = 100
+    assert (jobs.backoff(1), jobs.backoff(2)) == (3, 6)
+    assert jobs.backoff(100) == 100
+
+
+def test_run_workers_inline(note, author):
+    UserStats.objects.filter(pk=author.pk).update(notes_count=10)
+    job = jobs.enqueue("reconcile_user_stats", author=author)
+    call_command("run_workers", processes=0, once=True)
+    job.refresh_from_db()
+    assert job.status == Job.Status.DONE
+    assert job.result == {"checked": 1, "repaired": 1}
+    assert (job.progress_done, job.progress_total) == (1, 1)
+    assert UserStats.objects.get(pk=author.pk).notes_count == 1
+
+
+def test_status_endpoint_is_scoped(author, author_client, not_author_client):
+    job = jobs.enqueue("recount_tags", author=author)
+    url = reverse("notes:job", args=(job.pk,))
+    response = author_client.get(url)
+    assert response.json()["status"] == Job.Status.QUEUED
+    assert not_author_client.get(url).status_code == 404
+
+
+def test_import_from_uploaded_export(
+    author_client, author, note, settings, tmp_path
+):
+    settings.NOTES_EXPORT_DIR = tmp_path
+    upload = SimpleUploadedFile(
+        "notes.jsonl",
+        json.dumps({
+            "slug": "imported", "title": "Из файла", "text": "Текст",
+            "tags": ["архив"],
+        }, ensure_ascii=False).encode(),
+    )
+    response = author_client.post(
+        reverse("notes:import"), {"file": upload, "replace": "on"}
+    )
+    assert response.status_code == 302
+    job = Job.objects.get(kind="import_notes")
+    assert job.payload["replace"] is True
+    jobs.work("обработчик", once=True)
+    job.refresh_from_db()
+    assert job.status == Job.Status.DONE
+    assert job.result["created"] == 1
+    assert list(Note.objects.values_list("slug", flat=True)) == ["imported"]
+    assert Note.all_objects.get(pk=note.pk).deleted_at is not None
+    assert not list((tmp_path / "imports").iterdir())
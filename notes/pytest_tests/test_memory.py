@@ -0,0 +1,123 @@
+import json
+import tracemalloc
+from http import HTTPStatus
+from io import StringIO
+
+import pytest
+
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.management import call_command
+from django.http import StreamingHttpResponse
+from django.test.client import Client
+from django.urls import reverse
+
+from notes import memory
+
+
+@pytest.fixture
+def profiling(settings, tmp_path):
+    settings.NOTES_MEMORY_PROFILING = True
+    settings.NOTES_MEMORY_SAMPLE_RATE = 1
+    settings.NOTES_MEMORY_OVERHEAD = 1
+    settings.NOTES_MEMORY_DIR = tmp_path
+    return tmp_path
+
+
+def test_middleware_is_opt_in(settings):
+    settings.NOTES_MEMORY_PROFILING = False
+    with pytest.raises(MiddlewareNotUsed):
+        memory.MemoryProfilingMiddleware(lambda request: None)
+
+
+def test_sampled_requests_are_recorded_per_route(profiling, author, note):
+    client = Client()
+    client.force_login(author)
+    for _ in range(3):
+        client.get(reverse("notes:list"))
+    client.get(reverse("notes:detail", args=(note.slug,)))
+    assert not tracemalloc.is_tracing()
+    [path] = profiling.glob(memory.FILE_PATTERN)
+    rows = {row["route"]: row for row in memory.report(profiling)}
+    assert rows["notes:list"]["samples"] == 3
+    assert rows["notes:detail"]["samples"] == 1
+    assert rows["notes:list"]["peak_max"] > 0
+    assert rows["notes:list"]["sites"]
+
+
+def test_overhead_budget_stops_sampling(tmp_path):
+    sampler = memory.Sampler(tmp_path, sample_rate=1, overhead=0)
+    assert sampler.should_sample()
+    sampler.profile(lambda: [0] * 1000, lambda: "route")
+    assert not sampler.should_sample()
+
+
+def test_streaming_response_is_measured_until_consumed(tmp_path):
+    sampler = memory.Sampler(tmp_path, sample_rate=1, overhead=1)
+
+    def rows():
+        # Строки, как в NotesList, рендерятся только при отдаче.
+        for _ in range(10):
+            yield "x" * 100_000
+
+    response = sampler.profile(
+        lambda: StreamingHttpResponse(rows()), lambda: "route"
+    )
+    assert tracemalloc.is_tracing()
+    assert not sampler.routes
+    assert len(b"".join(response.streaming_content)) == 1_000_000
+    assert not tracemalloc.is_tracing()
+    assert sampler.routes["route"].peak_max >= 100_000
+    assert not sampler.lock.locked()
+
+
+@pytest.mark.django_db
+def test_interrupted_stream_releases_sampler(tmp_path):
+    sampler = memory.Sampler(tmp_path, sample_rate=1, overhead=1)
+    response = sampler.profile(
+        lambda: StreamingHttpResponse(iter(["a", "b"])), lambda: "route"
+    )
+    next(iter(response))
+    response.close()
+    assert not tracemalloc.is_tracing()
+    assert not sampler.lock.locked()
+    assert not sampler.routes
+
+
+def test_sampler_leaves_foreign_tracing_alone(tmp_path):
+    sampler = memory.Sampler(tmp_path, sample_rate=1, overhead=1)
+    tracemalloc.start()
+    try:
+        assert sampler.profile(lambda: "ok", lambda: "route") == "ok"
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
+    assert not sampler.routes
+
+
+def test_report_merges_processes(tmp_path):
+    for pid, peak in ((1, 100), (2, 300)):
+        (tmp_path / f"memory-{pid}.json").write_text(json.dumps({
+            "notes:list": {
+                "samples": 1, "peak_max": peak, "peak_total": peak,
+                "retained_total": 10, "sites": {"views.py:1": peak},
+            },
+        }))
+    (tmp_path / "memory-3.json").write_text("{")
+    [row] = memory.report(tmp_path)
+    assert row["samples"] == 2
+    assert row["peak_max"] == 300
+    assert row["peak_avg"] == 200
+    assert row["sites"] == {"views.py:1": 400}
+    out = StringIO()
+    call_command("memory_report", dir=tmp_path, stdout=out)
+    assert "notes:list: замеров 2" in out.getvalue()
+
+
+def test_report_endpoint_is_admin_only(
+    profiling, admin_client, author_client
+):
+    response = admin_client.get(reverse("notes:memory"))
+    assert response.status_code == HTTPStatus.OK
+    assert response.json()["enabled"] is True
+    response = author_client.get(reverse("notes:memory"))
+    assert response.status_code == HTTPStatus.FOUND
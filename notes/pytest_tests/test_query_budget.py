@@ -0,0 +1,167 @@
+import logging
+from http import HTTPStatus
+
+import pytest
+
+from django.contrib.auth import get_user_model
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.urls import URLPattern, resolve, reverse
+
+from notes import jobs, query_budget, urls
+from notes.models import Attachment, Blob, Note, Tag, Upload
+from notes.query_budget import QueryBudgetExceeded, QueryBudgetMiddleware
+
+SEEDED_NOTES = 300
+TAGS_PER_NOTE = 3
+User = get_user_model()
+
+
+@pytest.fixture
+def seeded(
+    author, not_author, tmp_path, settings, django_capture_on_commit_callbacks
+):
+    """Большой набор данных: N+1 на нём сразу выходит за бюджет."""
+    settings.NOTES_ATTACHMENTS_ROOT = tmp_path
+    settings.NOTES_PAGE_SIZE = SEEDED_NOTES
+    notes = Note.objects.bulk_create(
+        Note(title=f"Заметка {i}", text=f"Текст заметки {i}",
+             slug=f"n{user.pk}-{i}", author=user)
+        for user in (author, not_author)
+        for i in range(SEEDED_NOTES // 2)
+        if user == author or i < 10
+    )
+    for number in range(TAGS_PER_NOTE):
+        Note.objects.filter(author=author).add_tags({f"тег{number}"})
+    note = notes[0]
+    blob = Blob.objects.create(sha256="0" * 64, size=0)
+    blob.path.parent.mkdir(parents=True, exist_ok=True)
+    blob.path.touch()
+    attachments = Attachment.objects.bulk_create(
+        Attachment(note=note, blob=blob, name=f"file{i}.txt")
+        for i in range(20)
+    )
+    upload = Upload.objects.create(note=note, name="big.bin", size=10)
+    trashed = notes[1]
+    trashed.trash()
+    job = jobs.enqueue("recount_tags", author=author)
+    shared = notes[2]
+    with django_capture_on_commit_callbacks(execute=True):
+        shared.share()
+    return {
+        "slug": note.slug,
+        "pk": attachments[0].pk,
+        "upload_id": upload.pk,
+        "trashed": trashed.slug,
+        "job": job.pk,
+        "token": shared.share_token,
+    }
+
+
+# Имя маршрута -> (метод, аргументы из seeded, данные запроса).
+ROUTES = {
+    "home": ("get", (), {}),
+    "add": ("get", (), {}),
+    "edit": ("get", ("slug",), {}),
+    "detail": ("get", ("slug",), {}),
+    "duplicates": ("get", ("slug",), {}),
+    "share": ("post", ("slug",), {}),
+    "shared": ("get", ("token",), {}),
+    "attachment_upload": (
+        "post", ("slug",), {"name": "file.txt", "size": 10},
+    ),
+    "attachment_chunk": ("get", ("slug", "upload_id"), {}),
+    "attachment": ("get", ("slug", "pk"), {}),
+    "delete": ("get", ("slug",), {}),
+    "list": ("get", (), {}),
+    "trash": ("get", (), {}),
+    "restore": ("post", ("trashed",), {}),
+    "bulk": ("post", (), {"action": "tag", "all_notes": "on", "tags": "x"}),
+    "import": ("post", (), {}),
+    "success": ("get", (), {}),
+    "autocomplete": ("get", (), {"q": "Заметка"}),
+    "job": ("get", ("job",), {}),
+    "job_download": ("get", ("job",), {}),
+    "memory": ("get", (), {}),
+}
+
+
+def test_every_route_has_a_budget_check():
+    names = {
+        pattern.name for pattern in urls.urlpatterns
+        if isinstance(pattern, URLPattern)
+    }
+    assert names == ROUTES.keys()
+
+
+@pytest.mark.parametrize("name", ROUTES)
+def test_route_fits_query_budget(name, seeded, author_client, admin_client):
+    method, args, data = ROUTES[name]
+    url = reverse(f"notes:{name}", args=[seeded[arg] for arg in args])
+    client = admin_client if name == "memory" else author_client
+    view = resolve(url).func.view_class
+    assert getattr(view, "query_budget", None) is not None, (
+        f"{view.__name__} не объявляет query_budget"
+    )
+    # Промежуточный слой выбросит QueryBudgetExceeded при нарушении.
+    response = getattr(client, method)(url, data)
+    if response.streaming:
+        b"".join(response.streaming_content)
+    assert response.status_code < HTTPStatus.INTERNAL_SERVER_ERROR
+
+
+def test_streaming_list_fits_budget(seeded, author_client):
+    response = author_client.get(reverse("notes:list"), {"all": 1})
+    assert b"".join(response.streaming_content).count(b'name="notes"') == (
+        SEEDED_NOTES // 2 - 1
+    )
+
+
+def test_repeated_query_shape_is_reported(author, settings):
+    Note.objects.bulk_create(
+        Note(title=str(i), text="Текст", slug=f"n{i}", author=author)
+        for i in range(20)
+    )
+
+    def n_plus_one(request):
+        # Типичная регрессия: обращение к автору в цикле по заметкам.
+        names = [note.author.username for note in Note.objects.all()]
+        return HttpResponse(", ".join(names))
+
+    request = RequestFactory().get("/")
+    request.resolver_match = None
+    with pytest.raises(QueryBudgetExceeded, match="повторён 20 раз"):
+        QueryBudgetMiddleware(n_plus_one)(request)
+
+
+def test_budget_violation_is_logged_in_production(settings, author, caplog):
+    settings.NOTES_QUERY_BUDGET_RAISE = False
+    settings.NOTES_QUERY_BUDGET_DEFAULT = 1
+
+    def view(request):
+        list(Tag.objects.all())
+        list(User.objects.all())
+        return HttpResponse()
+
+    request = RequestFactory().get("/")
+    request.resolver_match = None
+    with caplog.at_level(logging.WARNING, logger="notes.query_budget"):
+        response = QueryBudgetMiddleware(view)(request)
+    assert response.status_code == HTTPStatus.OK
+    assert "при бюджете 1" in caplog.text
+
+
+def test_in_lists_of_different_length_share_a_shape():
+    assert query_budget.sql_shape(
+        "SELECT 1 WHERE id IN (%s, %s, %s)"
+    ) == query_budget.sql_shape("SELECT 1 WHERE id IN (%s)")
+
+
+def test_decorated_function_view_budget(client, db):
+    request = RequestFactory().get("/")
+    request.resolver_match = resolve(reverse("users:signup"))
+    assert query_budget.view_limits(request)[0] == 10
+    client.post(reverse("users:signup"), {
+        "username": "new", "password1": "Pa55-word!", "password2": "Pa55-word!"
+    })
+    assert User.objects.filter(username="new").exists()
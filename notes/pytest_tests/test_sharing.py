@@ -0,0 +1,142 @@
+from http import HTTPStatus
+
+import pytest
+
+from django.test.client import Client
+from django.urls import reverse
+
+from notes import sharing
+from notes.models import Note
+
+
+@pytest.fixture
+def shared_note(note, django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks(execute=True):
+        note.share()
+    return note
+
+
+def snapshot(note):
+    return sharing.snapshot_path(note.share_token)
+
+
+def test_author_shares_and_revokes_note(
+    author_client, note, django_capture_on_commit_callbacks
+):
+    url = reverse("notes:share", args=(note.slug,))
+    with django_capture_on_commit_callbacks(execute=True):
+        response = author_client.post(url)
+    assert response.status_code == HTTPStatus.FOUND
+    note.refresh_from_db()
+    assert note.share_token
+    path = snapshot(note)
+    assert note.text in path.read_text()
+    with django_capture_on_commit_callbacks(execute=True):
+        author_client.post(url, {"revoke": 1})
+    note.refresh_from_db()
+    assert note.share_token is None
+    assert not path.exists()
+
+
+def test_not_author_cannot_share(not_author_client, note):
+    response = not_author_client.post(
+        reverse("notes:share", args=(note.slug,))
+    )
+    assert response.status_code == HTTPStatus.NOT_FOUND
+    note.refresh_from_db()
+    assert note.share_token is None
+
+
+def test_shared_page_does_not_touch_database(
+    shared_note, author_client, django_assert_num_queries
+):
+    url = reverse("notes:shared", args=(shared_note.share_token,))
+    for client in (Client(), author_client):
+        with django_assert_num_queries(0):
+            response = client.get(url)
+            content = b"".join(response.streaming_content)
+        assert response.status_code == HTTPStatus.OK
+        assert shared_note.title.encode() in content
+        assert "public" in response["Cache-Control"]
+
+
+def test_shared_page_is_conditional(shared_note, client):
+    url = reverse("notes:shared", args=(shared_note.share_token,))
+    etag = client.get(url)["ETag"]
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == HTTPStatus.NOT_MODIFIED
+    assert response["ETag"] == etag
+
+
+def test_snapshot_follows_note_changes(
+    shared_note, client, django_capture_on_commit_callbacks
+):
+    url = reverse("notes:shared", args=(shared_note.share_token,))
+    etag = client.get(url)["ETag"]
+    with django_capture_on_commit_callbacks(execute=True):
+        Note.objects.get(pk=shared_note.pk).save()
+    # Страница не изменилась — снимок не перезаписан.
+    assert client.get(url)["ETag"] == etag
+    shared_note.text = "Новый текст"
+    with django_capture_on_commit_callbacks(execute=True):
+        shared_note.save()
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == HTTPStatus.OK
+    assert "Новый текст" in b"".join(response.streaming_content).decode()
+    with django_capture_on_commit_callbacks(execute=True):
+        Note.objects.filter(pk=shared_note.pk).update(text="Пакетно")
+    assert "Пакетно" in snapshot(shared_note).read_text()
+
+
+def test_trash_and_delete_remove_snapshot(
+    shared_note, client, django_capture_on_commit_callbacks
+):
+    url = reverse("notes:shared", args=(shared_note.share_token,))
+    with django_capture_on_commit_callbacks(execute=True):
+        shared_note.trash()
+    assert client.get(url).status_code == HTTPStatus.NOT_FOUND
+    with django_capture_on_commit_callbacks(execute=True):
+        shared_note.restore()
+    assert client.get(url).status_code == HTTPStatus.OK
+    with django_capture_on_commit_callbacks(execute=True):
+        shared_note.delete()
+    assert client.get(url).status_code == HTTPStatus.NOT_FOUND
+
+
+def test_purge_removes_snapshot(
+    shared_note, django_capture_on_commit_callbacks
+):
+    path = snapshot(shared_note)
+    with django_capture_on_commit_callbacks(execute=True):
+        list(Note.all_objects.all().purge())
+    assert not path.exists()
+
+
+def test_rolled_back_share_writes_nothing(note, share_root):
+    # Без коммита транзакции снимок не появляется.
+    note.share()
+    assert not share_root.exists()
+
+
+def test_snapshot_is_replaced_atomically(shared_note, share_root):
+    shared_note.title = "Другой заголовок"
+    assert sharing.publish(shared_note)
+    assert not sharing.publish(shared_note)
+    assert [path.name for path in share_root.iterdir()] == [
+        snapshot(shared_note).name
+    ]
+
+
+def test_unknown_or_malformed_token_is_not_found(client):
+    for token in ("missing", "..", "a.b"):
+        response = client.get(f"/share/{token}/")
+        assert response.status_code == HTTPStatus.NOT_FOUND
+
+
+def test_user_deletion_removes_snapshot(
+    shared_note, author, django_capture_on_commit_callbacks
+):
+    path = snapshot(shared_note)
+    with django_capture_on_commit_callbacks(execute=True):
+        author.delete()
+    assert not path.exists()
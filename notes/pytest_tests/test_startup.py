@@ -0,0 +1,22 @@
+import pytest
+
+from benchmarks.startup import measure
+
+# Бюджет холодного старта воркера без учёта запуска интерпретатора, с.
+STARTUP_BUDGET = 1.0
+LAZY_MODULES = ("pytils", "pytils.translit", "notes.admin", "notes.views")
+
+
+@pytest.mark.parametrize("target", ("wsgi", "asgi"))
+def test_cold_start_within_budget(target):
+    result = measure(target)
+    assert result["ready"]
+    assert result["total"] < STARTUP_BUDGET, (
+        f"Холодный старт {target}: {result['total']:.3f} с "
+        f"при бюджете {STARTUP_BUDGET} с"
+    )
+
+
+def test_expensive_modules_are_not_imported_on_boot():
+    modules = set(measure("wsgi")["modules"])
+    assert not modules & set(LAZY_MODULES)
@@ -0,0 +1,128 @@
+import gzip
+import zlib
+
+import pytest
+
+from django.http import FileResponse, HttpResponse
+from django.test import RequestFactory
+from django.urls import reverse
+
+from notes.middleware import CompressionMiddleware, compress_chunks
+from notes.models import Note
+
+
+@pytest.fixture
+def many_notes(author):
+    return Note.objects.bulk_create(
+        Note(title=f"Заметка {i}", text="Текст", slug=f"n{i}", author=author)
+        for i in range(30)
+    )
+
+
+def test_list_is_paginated(author_client, many_notes, settings):
+    settings.NOTES_PAGE_SIZE = 10
+    response = author_client.get(reverse("notes:list"), {"page": 2})
+    assert list(response.context["object_list"]) == many_notes[10:20]
+    assert b"all=1" in response.content
+
+
+def test_show_all_streams_rows_after_shell(author_client, many_notes):
+    response = author_client.get(reverse("notes:list"), {"all": 1})
+    assert response.streaming
+    chunks = [chunk.decode() for chunk in response.streaming_content]
+    assert "<header>" in chunks[0]
+    assert "Заметка 0" not in chunks[0]
+    content = "".join(chunks)
+    assert "<!-- stream -->" not in content
+    for note in many_notes:
+        assert f'value="{note.pk}"' in content
+    assert content.rstrip().endswith("</html>")
+
+
+def test_show_all_respects_tag_filter(author_client, many_notes):
+    Note.objects.filter(pk=many_notes[3].pk).add_tags({"работа"})
+    response = author_client.get(
+        reverse("notes:list"), {"all": 1, "tag": "работа"}
+    )
+    content = b"".join(response.streaming_content).decode()
+    assert "Заметка 3<" in content
+    assert "Заметка 4<" not in content
+
+
+def test_long_detail_is_streamed_escaped(author_client, note, settings):
+    settings.NOTES_STREAM_MIN_TEXT = 10
+    note.text = "<b>жирный</b> " * 10000
+    note.save()
+    response = author_client.get(reverse("notes:detail", args=(note.slug,)))
+    assert response.streaming
+    content = b"".join(response.streaming_content).decode()
+    assert content.count("&lt;b&gt;жирный&lt;/b&gt;") == 10000
+    assert "<b>жирный" not in content
+
+
+def test_short_detail_is_not_streamed(author_client, note):
+    response = author_client.get(reverse("notes:detail", args=(note.slug,)))
+    assert not response.streaming
+
+
+def test_compress_chunks_flushes_each_chunk():
+    pieces = compress_chunks([b"head" * 10, b"rows" * 1000, b"tail"])
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    received = b""
+    for piece, expected in zip(pieces, (b"", b"head" * 10)):
+        received += decompressor.decompress(piece)
+        assert received == expected
+
+
+def test_compress_chunks_pads_header_randomly():
+    lengths = set()
+    for _ in range(20):
+        compressed = b"".join(
+            compress_chunks([b"csrf" * 10], max_random_bytes=100)
+        )
+        assert gzip.decompress(compressed) == b"csrf" * 10
+        lengths.add(len(compressed))
+    # Длина имени файла в заголовке gzip случайна.
+    assert len(lengths) > 1
+
+
+def test_streaming_page_is_compressed(author_client, many_notes):
+    response = author_client.get(
+        reverse("notes:list"), {"all": 1}, headers={"Accept-Encoding": "gzip"}
+    )
+    assert response["Content-Encoding"] == "gzip"
+    content = gzip.decompress(b"".join(response.streaming_content)).decode()
+    assert "Заметка 29" in content
+
+
+def test_regular_page_is_compressed(author_client, many_notes):
+    response = author_client.get(
+        reverse("notes:list"), headers={"Accept-Encoding": "gzip"}
+    )
+    assert response["Content-Encoding"] == "gzip"
+    assert b"Notes" not in response.content
+    assert "Заметка 29" in gzip.decompress(response.content).decode()
+
+
+@pytest.mark.parametrize(
+    "response",
+    (
+        HttpResponse(b"x" * 100),
+        HttpResponse(b"x" * 5000, content_type="image/png"),
+        HttpResponse(b"x" * 5000, status=206),
+    ),
+)
+def test_compression_skips(response):
+    request = RequestFactory().get("/", headers={"Accept-Encoding": "gzip"})
+    middleware = CompressionMiddleware(lambda request: response)
+    assert not middleware(request).has_header("Content-Encoding")
+
+
+def test_compression_skips_files(tmp_path):
+    path = tmp_path / "file.txt"
+    path.write_text("x" * 5000)
+    response = FileResponse(open(path, "rb"))
+    request = RequestFactory().get("/", headers={"Accept-Encoding": "gzip"})
+    result = CompressionMiddleware(lambda request: response)(request)
+    assert not result.has_header("Content-Encoding")
+    result.file_to_stream.close()
@@ -0,0 +1,91 @@
+import pytest
+
+from django.urls import reverse
+
+from notes.models import Note, NoteTag, Tag
+
+
+@pytest.fixture
+def tagged_notes(author):
+    first = Note.objects.create(
+        title="Первая", text="Текст", slug="first", author=author
+    )
+    second = Note.objects.create(
+        title="Вторая", text="Текст", slug="second", author=author
+    )
+    first.set_tags({"работа", "идеи"})
+    second.set_tags({"работа"})
+    return first, second
+
+
+def test_create_note_with_tags(author_client, author, form_data):
+    form_data["tags"] = "Работа, идеи, работа,"
+    author_client.post(reverse("notes:add"), data=form_data)
+    note = Note.objects.get()
+    assert set(note.tags.values_list("name", flat=True)) == {"работа", "идеи"}
+    assert set(
+        Tag.objects.filter(author=author).values_list("name", "notes_count")
+    ) == {("работа", 1), ("идеи", 1)}
+
+
+def test_edit_note_tags_updates_counts(author_client, tagged_notes, form_data):
+    first, _ = tagged_notes
+    form_data["tags"] = "черновик"
+    author_client.post(reverse("notes:edit", args=(first.slug,)), form_data)
+    counts = dict(Tag.objects.values_list("name", "notes_count"))
+    assert counts == {"работа": 1, "идеи": 0, "черновик": 1}
+
+
+def test_set_tags_is_batched(tagged_notes, django_assert_max_num_queries):
+    first, _ = tagged_notes
+    with django_assert_max_num_queries(9):
+        first.set_tags({f"тег-{number}" for number in range(20)})
+    assert NoteTag.objects.filter(note=first).count() == 20
+
+
+@pytest.mark.parametrize(
+    "tags, expected_slugs",
+    (
+        (("работа",), {"first", "second"}),
+        (("работа", "идеи"), {"first"}),
+        (("нет-такого",), set()),
+    ),
+)
+def test_list_filtered_by_tags(
+    author_client, tagged_notes, tags, expected_slugs
+):
+    response = author_client.get(reverse("notes:list"), {"tag": tags})
+    slugs = {note.slug for note in response.context["object_list"]}
+    assert slugs == expected_slugs
+
+
+def test_sidebar_uses_stored_counts(author_client, tagged_notes):
+    response = author_client.get(reverse("notes:list"))
+    assert dict(
+        (tag.name, tag.notes_count) for tag in response.context["tags"]
+    ) == {"работа": 2, "идеи": 1}
+
+
+def test_delete_note_decrements_counts(tagged_notes):
+    first, second = tagged_notes
+    first.delete()
+    assert dict(Tag.objects.values_list("name", "notes_count")) == {
+        "работа": 1, "идеи": 0
+    }
+    Note.objects.filter(pk=second.pk).delete()
+    assert dict(Tag.objects.values_list("name", "notes_count")) == {
+        "работа": 0, "идеи": 0
+    }
+
+
+def test_tag_filter_starts_from_tag_index(author, not_author, tagged_notes):
+    Note.objects.create(
+        title="Чужая", text="Текст", slug="other", author=not_author
+    ).set_tags({"работа"})
+    notes = Note.objects.filter(author=author).with_tags(
+        {"работа", "идеи"}, author
+    )
+    plan = notes.explain()
+    assert plan.count("notetag_tag_note_idx") == 2
+    assert "SCAN" not in plan
+    assert list(notes) == [tagged_notes[0]]
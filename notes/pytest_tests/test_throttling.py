@@ -0,0 +1,57 @@
+from http import HTTPStatus
+
+import pytest
+
+from django.urls import reverse
+
+from notes.models import Note
+from notes.throttling import consume
+
+
+@pytest.fixture
+def tight_limits(settings):
+    settings.NOTES_THROTTLE_RATES = {
+        "notes_write": {"user": "2/m", "ip": "100/m"},
+        "signup": {"ip": "1/h"},
+    }
+
+
+def test_token_bucket_refills():
+    identities = [("user:1", "2/m")]
+    assert consume("scope", identities, now=0) is None
+    assert consume("scope", identities, now=0) is None
+    assert consume("scope", identities, now=0) == pytest.approx(30)
+    assert consume("scope", identities, now=30) is None
+
+
+def test_note_writes_are_throttled_per_user(
+    tight_limits, author_client, not_author_client, form_data
+):
+    url = reverse("notes:add")
+    for number in range(2):
+        form_data["slug"] = f"slug-{number}"
+        response = author_client.post(url, data=form_data)
+        assert response.status_code == HTTPStatus.FOUND
+    form_data["slug"] = "slug-extra"
+    response = author_client.post(url, data=form_data)
+    assert response.status_code == HTTPStatus.TOO_MANY_REQUESTS
+    assert 0 < int(response["Retry-After"]) <= 30
+    assert Note.objects.count() == 2
+    # Лимит считается отдельно для каждого пользователя.
+    response = not_author_client.post(url, data=form_data)
+    assert response.status_code == HTTPStatus.FOUND
+
+
+def test_reads_are_not_throttled(tight_limits, author_client):
+    for _ in range(5):
+        response = author_client.get(reverse("notes:add"))
+        assert response.status_code == HTTPStatus.OK
+
+
+@pytest.mark.django_db
+def test_signup_is_throttled_per_ip(tight_limits, client):
+    url = reverse("users:signup")
+    client.post(url, {"username": "первый"})
+    response = client.post(url, {"username": "второй"})
+    assert response.status_code == HTTPStatus.TOO_MANY_REQUESTS
+    assert "Retry-After" in response
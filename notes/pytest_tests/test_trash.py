@@ -0,0 +1,164 @@
+from datetime import timedelta
+from http import HTTPStatus
+from io import StringIO
+
+import pytest
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.urls import reverse
+from django.utils import timezone
+
+from notes import jobs, trash
+from notes.forms import WARNING
+from notes.models import Job, Note, NoteQuerySet, Tag, UserStats
+
+User = get_user_model()
+
+
+@pytest.fixture
+def tagged_note(note):
+    note.set_tags({"работа"})
+    return note
+
+
+def counters(note):
+    stats = UserStats.objects.get(pk=note.author_id)
+    tag = Tag.objects.get(author=note.author, name="работа")
+    return stats.notes_count, stats.chars_count, tag.notes_count
+
+
+def test_delete_moves_note_to_trash(author_client, tagged_note):
+    response = author_client.post(
+        reverse("notes:delete", args=(tagged_note.slug,))
+    )
+    assert response.status_code == HTTPStatus.FOUND
+    assert not Note.objects.exists()
+    assert Note.all_objects.get().deleted_at is not None
+    assert counters(tagged_note) == (0, 0, 0)
+    response = author_client.get(reverse("notes:trash"))
+    assert list(response.context["object_list"]) == [tagged_note]
+    url = reverse("notes:detail", args=(tagged_note.slug,))
+    assert author_client.get(url).status_code == HTTPStatus.NOT_FOUND
+
+
+def test_restore_from_trash(author_client, tagged_note):
+    tagged_note.trash()
+    response = author_client.post(
+        reverse("notes:restore", args=(tagged_note.slug,))
+    )
+    assert response.status_code == HTTPStatus.FOUND
+    assert Note.objects.get().deleted_at is None
+    assert counters(tagged_note) == (1, len(tagged_note.text), 1)
+
+
+def test_restore_is_scoped_to_author(not_author_client, tagged_note):
+    tagged_note.trash()
+    response = not_author_client.post(
+        reverse("notes:restore", args=(tagged_note.slug,))
+    )
+    assert response.status_code == HTTPStatus.NOT_FOUND
+    assert not Note.objects.exists()
+
+
+def test_trashed_slug_stays_taken(author_client, note, form_data):
+    note.trash()
+    form_data["slug"] = note.slug
+    response = author_client.post(reverse("notes:add"), data=form_data)
+    assert response.context["form"].errors["slug"] == [note.slug + WARNING]
+
+
+def test_hard_delete_of_trashed_note_keeps_counters(tagged_note, author):
+    Note.objects.create(title="Ещё", text="abc", author=author)
+    tagged_note.trash()
+    Note.all_objects.filter(pk=tagged_note.pk).delete()
+    assert UserStats.objects.get(pk=author.pk).notes_count == 1
+    call_command("reconcile_user_stats", stdout=StringIO())
+    assert UserStats.objects.get(pk=author.pk).notes_count == 1
+
+
+def test_purge_uses_small_batches(author):
+    Note.objects.bulk_create(
+        Note(title=str(i), text="Текст", slug=f"n{i}", author=author)
+        for i in range(7)
+    )
+    Note.objects.all().soft_delete()
+    assert list(Note.all_objects.purge(batch_size=3, time_limit=60)) == [
+        3, 3, 1
+    ]
+    assert not Note.all_objects.exists()
+
+
+def test_purge_trash_respects_retention(note, author):
+    old = Note.objects.create(title="Старая", text="abc", author=author)
+    old.trash()
+    Note.all_objects.filter(pk=old.pk).update(
+        deleted_at=timezone.now() - timedelta(days=31)
+    )
+    note.trash()
+    out = StringIO()
+    call_command("purge_trash", stdout=out)
+    assert "Удалено заметок: 1" in out.getvalue()
+    assert list(Note.all_objects.all()) == [note]
+
+
+def test_purge_trash_job(note):
+    note.trash()
+    job = jobs.enqueue("purge_trash", days=0)
+    jobs.work("test", once=True)
+    job.refresh_from_db()
+    assert job.status == Job.Status.DONE
+    assert job.result["purged"] == 1
+
+
+def test_incremental_vacuum_returns_free_pages(author):
+    Note.objects.bulk_create(
+        Note(title=str(i), text="x" * 2000, slug=f"n{i}", author=author)
+        for i in range(200)
+    )
+    Note.objects.all().delete()
+    assert trash.incremental_vacuum(pages=8) > 0
+    assert trash.incremental_vacuum() == 0
+
+
+@pytest.fixture
+def purge_spy(monkeypatch):
+    """Запоминает, шла ли каждая пачка purge() внутри транзакции."""
+    atomic = []
+    purge = NoteQuerySet.purge
+
+    def spy(self, *args, **kwargs):
+        for size in purge(self, *args, **kwargs):
+            atomic.append(connection.in_atomic_block)
+            yield size
+
+    monkeypatch.setattr(NoteQuerySet, "purge", spy)
+    return atomic
+
+
+@pytest.mark.django_db(transaction=True)
+def test_admin_user_delete_purges_outside_transaction(
+    admin_client, note, author, purge_spy
+):
+    response = admin_client.post(
+        reverse("admin:auth_user_delete", args=(author.pk,)), {"post": "yes"}
+    )
+    assert response.status_code == HTTPStatus.FOUND
+    assert not User.objects.get(pk=author.pk).is_active
+    assert not purge_spy
+    jobs.work("обработчик", once=True)
+    assert not User.objects.filter(pk=author.pk).exists()
+    assert not Note.all_objects.exists()
+    assert purge_spy == [False]
+    assert Job.objects.get(kind="delete_users").result == {
+        "users": 1, "purged": 1,
+    }
+
+
+def test_admin_delete_action_moves_notes_to_trash(admin_client, note):
+    admin_client.post(reverse("admin:notes_note_changelist"), {
+        "action": "trash_notes", "_selected_action": [note.pk],
+    })
+    assert not Note.objects.exists()
+    assert Note.all_objects.get().deleted_at is not None
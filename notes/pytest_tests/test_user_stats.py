@@ -0,0 +1,120 @@
+import pytest
+
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.db.models import QuerySet
+from django.urls import reverse
+
+from notes.models import Note, UserStats
+
+
+def stats_of(user):
+    stats = UserStats.objects.get(pk=user.pk)
+    return stats.notes_count, stats.chars_count
+
+
+def test_stats_follow_create_update_delete(author_client, author, form_data):
+    author_client.post(reverse("notes:add"), data=form_data)
+    assert stats_of(author) == (1, len(form_data["text"]))
+
+    note = Note.objects.get()
+    form_data["text"] = "Короче"
+    author_client.post(reverse("notes:edit", args=(note.slug,)), form_data)
+    assert stats_of(author) == (1, len("Короче"))
+    assert UserStats.objects.get(pk=author.pk).last_edited_at is not None
+
+    author_client.post(reverse("notes:delete", args=(note.slug,)))
+    assert stats_of(author) == (0, 0)
+
+
+def test_stats_follow_bulk_paths(author, not_author):
+    Note.objects.bulk_create([
+        Note(title="1", text="abc", slug="one", author=author),
+        Note(title="2", text="de", slug="two", author=author),
+        Note(title="3", text="f", slug="three", author=not_author),
+    ])
+    assert stats_of(author) == (2, 5)
+    assert stats_of(not_author) == (1, 1)
+
+    Note.objects.filter(slug="one").update(text="abcdef")
+    assert stats_of(author) == (2, 8)
+
+    Note.objects.filter(author=author).delete()
+    assert stats_of(author) == (0, 0)
+    assert stats_of(not_author) == (1, 1)
+
+
+def test_queryset_update_applies_difference(author, not_author):
+    Note.objects.bulk_create([
+        Note(title="1", text="abc", slug="one", author=author),
+        Note(title="2", text="de", slug="two", author=author),
+    ])
+    # Расхождение в чужих строках не должно исправляться полным пересчётом.
+    UserStats.objects.filter(pk=author.pk).update(notes_count=42)
+    Note.objects.filter(text="abc").update(text="abcdef")
+    assert stats_of(author) == (42, 8)
+
+    Note.objects.filter(slug="one").update(author=not_author)
+    assert stats_of(author) == (41, 2)
+    assert stats_of(not_author) == (1, 6)
+
+
+def test_user_deletion_cascades_stats(note, author):
+    author.delete()
+    assert not UserStats.objects.exists()
+
+
+def test_reconcile_repairs_drift(note, author, not_author):
+    UserStats.objects.filter(pk=author.pk).update(notes_count=42)
+    call_command("reconcile_user_stats", batch_size=1)
+    assert stats_of(author) == (1, len(note.text))
+    assert not UserStats.objects.filter(pk=not_author.pk).exists()
+
+
+def test_refresh_from_db_resets_loaded_values(author):
+    note = Note.objects.create(
+        title="Заголовок", text="abc", slug="refresh", author=author
+    )
+    Note.objects.filter(pk=note.pk).update(text="abcdef")
+    note.refresh_from_db()
+    assert note.changed_fields() == []
+    note.save()
+    assert stats_of(author) == (1, 6)
+    assert Note.objects.get(pk=note.pk).version == note.version == 2
+
+
+@pytest.mark.django_db
+def test_header_stats_single_lookup(author_client, note):
+    response = author_client.get(reverse("notes:home"))
+    assert response.context["note_stats"].notes_count == 1
+    assert "заметок: 1" in response.content.decode()
+
+
+def test_missing_row_is_built_from_existing_notes(author):
+    # Заметки, созданные в обход менеджера, как до появления статистики.
+    notes = QuerySet(Note).bulk_create(
+        Note(title=str(i), text="abc", slug=f"old-{i}", author=author)
+        for i in range(3)
+    )
+    notes[0].trash()
+    assert stats_of(author) == (2, 6)
+    notes[1].trash()
+    assert stats_of(author) == (1, 3)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_migration_backfills_stats(django_user_model):
+    executor = MigrationExecutor(connection)
+    executor.migrate([("notes", "0002_tags")])
+    apps = executor.loader.project_state([("notes", "0002_tags")]).apps
+    user = django_user_model.objects.create(username="Старый автор")
+    apps.get_model("notes", "Note").objects.bulk_create(
+        apps.get_model("notes", "Note")(
+            title=str(i), text="abcd", slug=f"old-{i}", author_id=user.pk
+        )
+        for i in range(2)
+    )
+    executor = MigrationExecutor(connection)
+    executor.migrate(executor.loader.graph.leaf_nodes())
+    assert stats_of(user) == (2, 8)
@@ -0,0 +1,112 @@
+from http import HTTPStatus
+
+import pytest
+
+from django.db.models import signals
+from django.urls import reverse
+
+from notes.models import Note, VersionConflict
+
+
+def test_edit_increments_version(author_client, note, form_data):
+    form_data["version"] = note.version
+    url = reverse("notes:edit", args=(note.slug,))
+    response = author_client.post(url, form_data)
+    assert response.status_code == HTTPStatus.FOUND
+    note.refresh_from_db()
+    assert note.version == 2
+
+
+def test_stale_edit_returns_conflict(author_client, note, form_data):
+    Note.objects.filter(pk=note.pk).update(text="Правка с другого устройства")
+    form_data["version"] = note.version
+    url = reverse("notes:edit", args=(note.slug,))
+    response = author_client.post(url, form_data)
+    assert response.status_code == HTTPStatus.CONFLICT
+    assert response["X-Note-Version"] == "2"
+    assert response.context["form"]["version"].value() == 2
+    note.refresh_from_db()
+    assert note.text == "Правка с другого устройства"
+
+
+def test_stale_instance_save_raises(note):
+    stale = Note.objects.get(pk=note.pk)
+    fresh = Note.objects.get(pk=note.pk)
+    fresh.title = "Первый"
+    fresh.save()
+    stale.title = "Второй"
+    with pytest.raises(VersionConflict) as conflict:
+        stale.save()
+    assert conflict.value.current_version == 2
+
+
+def test_update_writes_only_changed_fields(note, django_assert_num_queries):
+    note = Note.objects.get(pk=note.pk)
+    note.title = "Новый заголовок"
+    with django_assert_num_queries(4) as captured:
+        note.save()
+    update = next(
+        query["sql"] for query in captured.captured_queries
+        if query["sql"].startswith('UPDATE "notes_note"')
+    )
+    assert '"title"' in update
+    assert '"text"' not in update
+    assert '"version" = ' in update.split("WHERE")[1]
+
+
+def test_unchanged_save_does_not_write(note, django_assert_num_queries):
+    note = Note.objects.get(pk=note.pk)
+    with django_assert_num_queries(2) as captured:
+        note.save()
+    assert not any(
+        query["sql"].startswith("UPDATE")
+        for query in captured.captured_queries
+    )
+    assert Note.objects.get(pk=note.pk).version == 1
+
+
+def test_stale_tag_only_edit_returns_conflict(
+    author_client, note, form_data
+):
+    note.set_tags({"работа"})
+    Note.objects.filter(pk=note.pk).update(text="Правка с другого устройства")
+    form_data.update(
+        title=note.title, text="Правка с другого устройства", slug=note.slug,
+        tags="личное", version=note.version,
+    )
+    url = reverse("notes:edit", args=(note.slug,))
+    response = author_client.post(url, form_data)
+    assert response.status_code == HTTPStatus.CONFLICT
+    assert list(note.tags.values_list("name", flat=True)) == ["работа"]
+
+
+def test_tag_only_edit_bumps_version(author_client, note, form_data):
+    form_data.update(
+        title=note.title, text=note.text, slug=note.slug, tags="личное",
+        version=note.version,
+    )
+    url = reverse("notes:edit", args=(note.slug,))
+    assert author_client.post(url, form_data).status_code == HTTPStatus.FOUND
+    note.refresh_from_db()
+    assert note.version == 2
+    assert list(note.tags.values_list("name", flat=True)) == ["личное"]
+
+
+def test_update_sends_save_signals(note):
+    received = []
+
+    def receiver(signal, **kwargs):
+        received.append((signal, kwargs.get("update_fields")))
+
+    signals.pre_save.connect(receiver, sender=Note)
+    signals.post_save.connect(receiver, sender=Note)
+    try:
+        note.title = "Новый заголовок"
+        note.save(update_fields=("title",))
+    finally:
+        signals.pre_save.disconnect(receiver, sender=Note)
+        signals.post_save.disconnect(receiver, sender=Note)
+    assert received == [
+        (signals.pre_save, frozenset({"title"})),
+        (signals.post_save, frozenset({"title"})),
+    ]
@@ -0,0 +1,132 @@
+"""Бюджет SQL-запросов на один запрос к приложению.
+
+Каждое представление может объявить атрибут query_budget — сколько
+запросов к базе ему разрешено, — и query_repeat_limit — сколько раз
+допустим запрос одной и той же формы. Повтор одной формы и есть
+признак N+1: шаблон, обращающийся к note.author в цикле по заметкам,
+даст по запросу на строку. Промежуточный слой считает запросы через
+execute_wrapper и при нарушении пишет предупреждение в журнал или,
+если NOTES_QUERY_BUDGET_RAISE включён (в тестах), выбрасывает
+QueryBudgetExceeded.
+"""
+import logging
+import re
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+IN_LIST_RE = re.compile(r'\((?:%s, )*%s\)')
+# Админка — инструмент персонала с тяжёлыми по природе операциями;
+# для неё проверяются только повторы, а не общий бюджет.
+UNBUDGETED_NAMESPACES = ('admin',)
+
+
+class QueryBudgetExceeded(Exception):
+    """Запрос к приложению выполнил больше SQL-запросов, чем разрешено."""
+
+
+def query_budget(budget, repeat_limit=None):
+    """Объявляет бюджет функции-представления; для CBV — атрибуты класса."""
+    def decorator(view):
+        view.query_budget = budget
+        if repeat_limit is not None:
+            view.query_repeat_limit = repeat_limit
+        return view
+    return decorator
+
+
+def sql_shape(sql):
+    """Форма запроса: списки IN разной длины считаются одинаковыми."""
+    return IN_LIST_RE.sub('(%s, ...)', sql)
+
+
+class QueryCounter:
+    """execute_wrapper, считающий запросы и их формы."""
+
+    def __init__(self):
+        self.total = 0
+        self.shapes = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        self.total += 1
+        self.shapes[sql_shape(sql)] += 1
+        return execute(sql, params, many, context)
+
+    def problems(self, budget, repeat_limit):
+        problems = []
+        if budget is not None and self.total > budget:
+            problems.append(
+                f'выполнено {self.total} SQL-запросов при бюджете {budget}'
+            )
+        if repeat_limit is not None:
+            for shape, count in self.shapes.most_common():
+                if count <= repeat_limit:
+                    break
+                problems.append(
+                    f'запрос повторён {count} раз '
+                    f'(допустимо {repeat_limit}): {shape}'
+                )
+        return problems
+
+
+def view_limits(request):
+    """Бюджет и лимит повторов представления, обработавшего запрос."""
+    budget = settings.NOTES_QUERY_BUDGET_DEFAULT
+    repeat_limit = settings.NOTES_QUERY_REPEAT_LIMIT
+    match = request.resolver_match
+    if match is None:
+        return budget, repeat_limit
+    if match.namespace in UNBUDGETED_NAMESPACES:
+        return None, repeat_limit
+    # Атрибут декоратора на функции важнее атрибута класса CBV.
+    for view in (getattr(match.func, 'view_class', None), match.func):
+        budget = getattr(view, 'query_budget', budget)
+        repeat_limit = getattr(view, 'query_repeat_limit', repeat_limit)
+    return budget, repeat_limit
+
+
+def counting(counter):
+    stack = ExitStack()
+    for connection in connections.all():
+        stack.enter_context(connection.execute_wrapper(counter))
+    return stack
+
+
+class QueryBudgetMiddleware:
+    """Проверяет каждый запрос к приложению на бюджет SQL-запросов.
+
+    Для потоковых ответов запросы считаются до конца отдачи содержимого.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        counter = QueryCounter()
+        with counting(counter):
+            response = self.get_response(request)
+        if response.streaming and not response.is_async:
+            response.streaming_content = self.stream(
+                request, response.streaming_content, counter
+            )
+        else:
+            self.check(request, counter)
+        return response
+
+    def stream(self, request, content, counter):
+        with counting(counter):
+            yield from content
+        self.check(request, counter)
+
+    def check(self, request, counter):
+        problems = counter.problems(*view_limits(request))
+        if not problems:
+            return
+        message = f'{request.method} {request.path}: ' + '; '.join(problems)
+        if settings.NOTES_QUERY_BUDGET_RAISE:
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
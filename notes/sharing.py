@@ -0,0 +1,115 @@
+"""Публичные ссылки на заметки, отдаваемые из статических снимков.
+
+При сохранении заметки с открытой ссылкой её страница заранее
+рендерится в файл NOTES_SHARE_ROOT/<token>.html. Первая строка файла —
+комментарий с SHA-256 содержимого: он служит ETag и позволяет не
+перезаписывать снимок, если страница не изменилась. Файл заменяется
+атомарно через os.replace, поэтому читатель видит либо старую, либо новую
+версию целиком.
+
+Анонимные запросы по ссылке читают только файл и не обращаются к БД;
+каталог снимков может отдавать и сам веб-сервер.
+"""
+import hashlib
+import os
+import re
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.template.loader import render_to_string
+
+TOKEN_RE = re.compile(r'^[\w-]+$', re.ASCII)
+TEMPLATE_NAME = 'notes/share.html'
+HEADER = b'<!-- sha256:%s -->\n'
+HEADER_LENGTH = len(HEADER % (b'0' * 64))
+
+
+def snapshot_path(token):
+    if not TOKEN_RE.match(token):
+        raise FileNotFoundError(token)
+    return Path(settings.NOTES_SHARE_ROOT) / f'{token}.html'
+
+
+def render(note):
+    """Содержимое снимка: заголовок с хешем и страница заметки."""
+    body = render_to_string(TEMPLATE_NAME, {'note': note}).encode()
+    digest = hashlib.sha256(body).hexdigest().encode()
+    return HEADER % digest + body
+
+
+def read_header(snapshot):
+    header = snapshot.read(HEADER_LENGTH)
+    snapshot.seek(0)
+    return header
+
+
+def etag(header):
+    """Значение ETag по хешу из первой строки снимка."""
+    return f'"{header[12:44].decode()}"'
+
+
+def publish(note):
+    """Записывает снимок заметки, если её содержимое изменилось.
+
+    Возвращает True, если файл был перезаписан.
+    """
+    path = snapshot_path(note.share_token)
+    content = render(note)
+    try:
+        with open(path, 'rb') as snapshot:
+            if read_header(snapshot) == content[:HEADER_LENGTH]:
+                return False
+    except FileNotFoundError:
+        path.parent.mkdir(parents=True, exist_ok=True)
+    descriptor, temporary = tempfile.mkstemp(
+        dir=path.parent, prefix='.', suffix='.tmp'
+    )
+    try:
+        with os.fdopen(descriptor, 'wb') as snapshot:
+            snapshot.write(content)
+        os.chmod(temporary, 0o644)
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+    return True
+
+
+def remove(token):
+    """Удаляет снимок; отсутствующий файл не считается ошибкой."""
+    snapshot_path(token).unlink(missing_ok=True)
+
+
+def sync(pks, old_tokens=()):
+    """Приводит снимки заметок pks в соответствие с БД.
+
+    Снимки old_tokens, которые больше не принадлежат живой заметке
+    с открытой ссылкой, удаляются.
+    """
+    from .models import Note
+
+    shared = {
+        note.share_token: note
+        for note in Note.objects.filter(
+            pk__in=pks, share_token__isnull=False
+        ).only('title', 'text', 'share_token')
+    }
+    for token in set(old_tokens) - shared.keys():
+        remove(token)
+    for note in shared.values():
+        publish(note)
+
+
+def open_snapshot(token):
+    """Открывает снимок для отдачи: файл, ETag и время изменения."""
+    snapshot = open(snapshot_path(token), 'rb')
+    try:
+        header = read_header(snapshot)
+        if len(header) < HEADER_LENGTH:
+            raise FileNotFoundError(token)
+        mtime = int(os.fstat(snapshot.fileno()).st_mtime)
+        return snapshot, etag(header), mtime
+    except BaseException:
+        snapshot.close()
+        raise
@@ -0,0 +1,70 @@
+"""MinHash-отпечатки заметок для поиска почти одинаковых текстов.
+
+Текст разбивается на шинглы, для них считается MinHash-подпись из
+BANDS * ROWS значений. Подпись режется на BANDS полос по ROWS значений,
+каждая полоса хешируется в одно число и хранится в индексированной
+колонке. Заметки с похожими шинглами с высокой вероятностью совпадают
+хотя бы по одной полосе (LSH), поэтому кандидатов ищут равенством по
+индексам, а затем проверяют точным коэффициентом Жаккара.
+"""
+import random
+import re
+from hashlib import blake2b
+
+BANDS = 4
+ROWS = 2
+SHINGLE_SIZE = 2
+THRESHOLD = 0.7
+
+PRIME = (1 << 61) - 1
+WORD_RE = re.compile(r'\w+')
+
+_random = random.Random(20240601)
+PERMUTATIONS = [
+    (_random.randrange(1, PRIME), _random.randrange(PRIME))
+    for _ in range(BANDS * ROWS)
+]
+
+
+def shingles(text):
+    """Множество перекрывающихся последовательностей из SHINGLE_SIZE слов."""
+    words = WORD_RE.findall(text.lower())
+    if len(words) <= SHINGLE_SIZE:
+        return {' '.join(words)} if words else set()
+    return {
+        ' '.join(words[start:start + SHINGLE_SIZE])
+        for start in range(len(words) - SHINGLE_SIZE + 1)
+    }
+
+
+def _hash(value):
+    return int.from_bytes(blake2b(value, digest_size=8).digest(), 'big')
+
+
+def signature(items):
+    """MinHash-подпись множества шинглов."""
+    hashes = [_hash(item.encode()) for item in items]
+    if not hashes:
+        return []
+    return [
+        min((a * value + b) % PRIME for value in hashes)
+        for a, b in PERMUTATIONS
+    ]
+
+
+def bands(text):
+    """Значения LSH-полос текста как знаковые 63-битные числа."""
+    minhashes = signature(shingles(text))
+    if not minhashes:
+        return [None] * BANDS
+    return [
+        _hash(repr(minhashes[band * ROWS:(band + 1) * ROWS]).encode()) >> 1
+        for band in range(BANDS)
+    ]
+
+
+def jaccard(first, second):
+    """Точный коэффициент Жаккара двух множеств шинглов."""
+    if not first and not second:
+        return 1.0
+    return len(first & second) / len(first | second)
@@ -0,0 +1,63 @@
+"""Потоковая отдача больших HTML-страниц.
+
+Шаблон страницы рендерится целиком, но вместо тяжёлой части в нём
+стоит маркер. Всё до маркера — шапка и оболочка base.html — уходит
+клиенту сразу, затем по частям отдаётся содержимое, затем хвост
+шаблона. Так браузер начинает рисовать страницу, пока сервер ещё
+читает заметки из базы.
+"""
+from django.http import StreamingHttpResponse
+from django.template.loader import get_template, render_to_string
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+STREAM_MARKER = mark_safe('<!-- stream -->')
+CHUNK_SIZE = 200
+TEXT_CHUNK_SIZE = 64 * 1024
+
+
+def batches(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def render_rows(template_name, queryset, chunk_size=CHUNK_SIZE):
+    """Рендерит строки шаблоном template_name пачками из итератора БД."""
+    template = get_template(template_name)
+    for notes in batches(queryset.iterator(chunk_size=chunk_size), chunk_size):
+        yield template.render({'notes': notes})
+
+
+def text_chunks(text, size=TEXT_CHUNK_SIZE):
+    """Экранированный текст частями.
+
+    Экранирование посимвольное, поэтому резать текст можно в любом месте.
+    """
+    for start in range(0, len(text), size):
+        yield escape(text[start:start + size])
+
+
+class StreamingRenderMixin:
+    """Отдаёт шаблон потоком: оболочку сразу, части — по мере готовности."""
+
+    def render_streaming(self, context, parts):
+        context['stream_marker'] = STREAM_MARKER
+        content = render_to_string(
+            self.get_template_names(), context, self.request
+        )
+        head, tail = content.split(STREAM_MARKER, 1)
+
+        def stream():
+            yield head
+            yield from parts
+            yield tail
+
+        return StreamingHttpResponse(
+            stream(), content_type='text/html; charset=utf-8'
+        )
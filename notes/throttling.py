@@ -0,0 +1,89 @@
+"""Ограничение частоты записи по алгоритму token bucket поверх кэша Django.
+
+Состояние корзины — пара (токены, время) под одним ключом кэша, поэтому
+проверка обходится одним get и одним set и работает с любым бэкендом,
+включая локальную память и файловый кэш.
+"""
+import math
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    """'60/m' -> (ёмкость, токенов в секунду)."""
+    count, period = rate.split('/')
+    count = int(count)
+    return count, count / PERIODS[period[0]]
+
+
+def get_rates(scope):
+    rates = getattr(settings, 'NOTES_THROTTLE_RATES', {})
+    return rates.get(scope) or {}
+
+
+def get_identities(request, scope):
+    """Ключи корзин запроса: пользователь и IP-адрес."""
+    rates = get_rates(scope)
+    identities = []
+    user = getattr(request, 'user', None)
+    if rates.get('user') and user is not None and user.is_authenticated:
+        identities.append((f'user:{user.pk}', rates['user']))
+    if rates.get('ip'):
+        identities.append((f'ip:{request.META.get("REMOTE_ADDR")}',
+                           rates['ip']))
+    return identities
+
+
+def consume(scope, identities, now=None):
+    """Забирает токен из всех корзин.
+
+    Возвращает None, если запрос разрешён, иначе число секунд до
+    появления токена. При отказе токены не списываются.
+    """
+    cache = caches[getattr(settings, 'NOTES_THROTTLE_CACHE', 'default')]
+    now = time.time() if now is None else now
+    keys = {f'throttle:{scope}:{identity}': rate
+            for identity, rate in identities}
+    stored = cache.get_many(keys)
+    buckets = {}
+    wait = 0
+    for key, rate in keys.items():
+        capacity, refill = parse_rate(rate)
+        tokens, updated = stored.get(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - updated) * refill)
+        buckets[key] = (tokens, capacity / refill)
+        if tokens < 1:
+            wait = max(wait, (1 - tokens) / refill)
+    if wait:
+        return wait
+    cache.set_many(
+        {key: (tokens - 1, now) for key, (tokens, _) in buckets.items()},
+        timeout=math.ceil(max(ttl for _, ttl in buckets.values())),
+    )
+    return None
+
+
+def throttle(scope, methods=('POST',)):
+    """Декоратор представления: 429 и Retry-After при превышении лимита."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method in methods:
+                identities = get_identities(request, scope)
+                wait = identities and consume(scope, identities)
+                if wait:
+                    response = HttpResponse(
+                        'Слишком много запросов, попробуйте позже.',
+                        status=429,
+                    )
+                    response['Retry-After'] = str(math.ceil(wait))
+                    return response
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
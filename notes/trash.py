@@ -0,0 +1,70 @@
+"""Корзина: окончательное удаление заметок и возврат места в файле базы.
+
+Удалённые пользователем заметки сначала лишь помечаются deleted_at.
+Строки стираются позже небольшими пачками, каждая в своей короткой
+транзакции, а освободившиеся страницы SQLite возвращает через
+PRAGMA incremental_vacuum, тоже порциями.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils import timezone
+
+from .models import Note
+
+PURGE_BATCH_SIZE = 500
+PURGE_TIME_LIMIT = 0.2
+VACUUM_PAGES = 256
+INCREMENTAL = 2
+
+
+def expired(days=None, now=None):
+    """Заметки, пролежавшие в корзине дольше срока хранения."""
+    if days is None:
+        days = settings.NOTES_TRASH_RETENTION_DAYS
+    cutoff = (now or timezone.now()) - timedelta(days=days)
+    return Note.all_objects.filter(deleted_at__lte=cutoff)
+
+
+def purge_author(user_id, batch_size=PURGE_BATCH_SIZE,
+                 time_limit=PURGE_TIME_LIMIT):
+    """Удаляет все заметки пользователя пачками перед удалением аккаунта.
+
+    Каскад от пользователя удалил бы их одной большой транзакцией.
+    Пачки коротки, только если вызов не обёрнут во внешнюю транзакцию:
+    аккаунты удаляет фоновая задача delete_users.
+    """
+    return sum(
+        Note.all_objects.filter(author_id=user_id).purge(
+            batch_size, time_limit
+        )
+    )
+
+
+def incremental_vacuum(pages=VACUUM_PAGES, using=DEFAULT_DB_ALIAS):
+    """Возвращает свободные страницы базы порциями по pages.
+
+    Возвращает число освобождённых страниц. Для баз не в режиме
+    auto_vacuum=INCREMENTAL ничего не делает.
+    """
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return 0
+    freed = 0
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA auto_vacuum')
+        if cursor.fetchone()[0] != INCREMENTAL:
+            return 0
+        cursor.execute('PRAGMA freelist_count')
+        free = cursor.fetchone()[0]
+        while free:
+            cursor.execute(f'PRAGMA incremental_vacuum({min(pages, free)})')
+            cursor.fetchall()
+            cursor.execute('PRAGMA freelist_count')
+            remaining = cursor.fetchone()[0]
+            if remaining >= free:
+                break
+            freed += free - remaining
+            free = remaining
+    return freed
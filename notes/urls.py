@@ -9,7 +9,53 @@ urlpatterns = [
     path('add/', views.NoteCreate.as_view(), name='add'),
     path('edit/<slug:slug>/', views.NoteUpdate.as_view(), name='edit'),
     path('note/<slug:slug>/', views.NoteDetail.as_view(), name='detail'),
+    path(
+        'note/<slug:slug>/duplicates/',
+        views.NoteDuplicates.as_view(),
+        name='duplicates',
+    ),
+    path(
+        'note/<slug:slug>/share/',
+        views.NoteShare.as_view(),
+        name='share',
+    ),
+    path('share/<slug:token>/', views.SharedNote.as_view(), name='shared'),
+    path(
+        'note/<slug:slug>/attachments/',
+        views.AttachmentUploadStart.as_view(),
+        name='attachment_upload',
+    ),
+    path(
+        'note/<slug:slug>/attachments/uploads/<uuid:upload_id>/',
+        views.AttachmentUploadChunk.as_view(),
+        name='attachment_chunk',
+    ),
+    path(
+        'note/<slug:slug>/attachments/<int:pk>/',
+        views.AttachmentDownload.as_view(),
+        name='attachment',
+    ),
     path('delete/<slug:slug>/', views.NoteDelete.as_view(), name='delete'),
     path('notes/', views.NotesList.as_view(), name='list'),
+    path('notes/bulk/', views.NoteBulkAction.as_view(), name='bulk'),
+    path('notes/import/', views.NoteImport.as_view(), name='import'),
+    path('trash/', views.NoteTrash.as_view(), name='trash'),
+    path(
+        'trash/<slug:slug>/restore/',
+        views.NoteRestore.as_view(),
+        name='restore',
+    ),
     path('done/', views.NoteSuccess.as_view(), name='success'),
+    path(
+        'autocomplete/',
+        views.NoteAutocomplete.as_view(),
+        name='autocomplete',
+    ),
+    path('jobs/<int:pk>/', views.JobStatus.as_view(), name='job'),
+    path(
+        'jobs/<int:pk>/download/',
+        views.JobDownload.as_view(),
+        name='job_download',
+    ),
+    path('memory/', views.MemoryReport.as_view(), name='memory'),
 ]
@@ -1,18 +1,39 @@
+from http import HTTPStatus
+
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.urls import reverse_lazy
+from django.db import transaction
+from django.http import (
+    FileResponse, Http404, HttpResponse, HttpResponseNotFound,
+    HttpResponseRedirect, JsonResponse,
+)
+from django.shortcuts import get_object_or_404
+from django.urls import reverse, reverse_lazy
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.decorators import method_decorator
+from django.utils.http import (
+    content_disposition_header, http_date, urlencode
+)
 from django.views import generic
+from django.views.generic.detail import SingleObjectMixin
 
-from .forms import NoteForm
-from .models import Note
+from . import attachments, backups, jobs, memory, sharing, streaming
+from .forms import NoteBulkForm, NoteForm, NoteImportForm
+from .models import Job, Note, Tag, Upload, VersionConflict
+from .throttling import throttle
 
 
 class Home(generic.TemplateView):
     """Домашняя страница."""
+    query_budget = 5
     template_name = 'notes/home.html'
 
 
 class NoteSuccess(LoginRequiredMixin, generic.TemplateView):
     """Страница успешного выполнения операции."""
+    query_budget = 5
     template_name = 'notes/success.html'
 
 
@@ -26,34 +47,563 @@ class NoteBase(LoginRequiredMixin):
         return self.model.objects.filter(author=self.request.user)
 
 
+@method_decorator(throttle('notes_write'), name='dispatch')
 class NoteCreate(NoteBase, generic.CreateView):
     """Добавление заметки."""
+    query_budget = 20
     template_name = 'notes/form.html'
     form_class = NoteForm
 
     def form_valid(self, form):
-        new_note = form.save(commit=False)
-        new_note.author = self.request.user
-        new_note.save()
-        return super().form_valid(form)
+        form.instance.author = self.request.user
+        response = super().form_valid(form)
+        duplicates = Note.objects.near_duplicates(self.object)
+        if duplicates:
+            messages.warning(self.request, (
+                'Заметка похожа на уже существующие: '
+                + ', '.join(note.title for note in duplicates[:5])
+            ))
+        return response
 
 
+@method_decorator(throttle('notes_write'), name='dispatch')
 class NoteUpdate(NoteBase, generic.UpdateView):
     """Редактирование заметки."""
+    query_budget = 20
     template_name = 'notes/form.html'
     form_class = NoteForm
 
+    def form_valid(self, form):
+        """При конфликте версий возвращает форму со статусом 409."""
+        try:
+            return super().form_valid(form)
+        except VersionConflict as conflict:
+            form.add_error(None, (
+                'Заметку уже изменили в другом месте '
+                f'(текущая версия {conflict.current_version}). '
+                'Проверьте данные и сохраните ещё раз.'
+            ))
+            form.data = form.data.copy()
+            form.data['version'] = conflict.current_version
+            response = self.render_to_response(
+                self.get_context_data(
+                    form=form, current_version=conflict.current_version
+                ),
+                status=HTTPStatus.CONFLICT,
+            )
+            response['X-Note-Version'] = str(conflict.current_version)
+            return response
+
 
+@method_decorator(throttle('notes_write'), name='dispatch')
 class NoteDelete(NoteBase, generic.DeleteView):
-    """Удаление заметки."""
+    """Удаление заметки в корзину."""
+    query_budget = 20
     template_name = 'notes/delete.html'
 
+    def form_valid(self, form):
+        self.object.trash()
+        return HttpResponseRedirect(self.get_success_url())
+
+
+class TrashBase(NoteBase):
+    """Работа с заметками пользователя в корзине."""
 
-class NotesList(NoteBase, generic.ListView):
-    """Список всех заметок пользователя."""
+    def get_queryset(self):
+        return self.model.all_objects.filter(
+            author=self.request.user
+        ).trashed()
+
+
+class NoteTrash(TrashBase, generic.ListView):
+    """Корзина со сроком хранения заметок."""
+    query_budget = 6
+    template_name = 'notes/trash.html'
+
+    def get_queryset(self):
+        return super().get_queryset().order_by('-deleted_at')
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['retention_days'] = settings.NOTES_TRASH_RETENTION_DAYS
+        return context
+
+
+@method_decorator(throttle('notes_write'), name='dispatch')
+class NoteRestore(TrashBase, SingleObjectMixin, generic.View):
+    """Возвращение заметки из корзины."""
+    query_budget = 20
+    http_method_names = ('post',)
+
+    def post(self, request, *args, **kwargs):
+        note = self.get_object()
+        note.restore()
+        return HttpResponseRedirect(reverse('notes:detail', args=(note.slug,)))
+
+
+class NotesList(NoteBase, streaming.StreamingRenderMixin, generic.ListView):
+    """Список всех заметок пользователя.
+
+    Страницы по NOTES_PAGE_SIZE заметок; ?all=1 показывает весь список
+    потоком, не собирая его в памяти.
+    """
+    query_budget = 10
     template_name = 'notes/list.html'
+    rows_template_name = 'includes/note_rows.html'
+
+    def show_all(self):
+        return bool(self.request.GET.get('all'))
 
+    def get_paginate_by(self, queryset):
+        if self.show_all():
+            return None
+        return settings.NOTES_PAGE_SIZE
 
-class NoteDetail(NoteBase, generic.DetailView):
-    """Заметка подробно."""
+    def get_selected_tags(self):
+        """Теги из параметров запроса ?tag=...&tag=..."""
+        return [
+            name.strip().lower()
+            for name in self.request.GET.getlist('tag')
+            if name.strip()
+        ]
+
+    def get_queryset(self):
+        """Фильтрует заметки по выбранным тегам."""
+        return super().get_queryset().with_tags(
+            self.get_selected_tags(), self.request.user
+        ).order_by('pk')
+
+    def get_context_data(self, **kwargs):
+        """Добавляет боковую панель тегов с готовыми счётчиками."""
+        context = super().get_context_data(**kwargs)
+        context['tags'] = Tag.objects.filter(
+            author=self.request.user, notes_count__gt=0
+        )
+        context['selected_tags'] = self.get_selected_tags()
+        # Начало строки запроса для ссылок пагинации, сохраняющих фильтр.
+        tag_query = urlencode({'tag': context['selected_tags']}, doseq=True)
+        context['tag_query'] = tag_query + '&' if tag_query else ''
+        context['bulk_form'] = NoteBulkForm()
+        context['import_form'] = NoteImportForm()
+        return context
+
+    def render_to_response(self, context, **response_kwargs):
+        if not self.show_all():
+            return super().render_to_response(context, **response_kwargs)
+        rows = streaming.render_rows(
+            self.rows_template_name,
+            self.object_list.only('pk', 'slug', 'title'),
+        )
+        return self.render_streaming(context, rows)
+
+
+@method_decorator(throttle('notes_write'), name='dispatch')
+class NoteBulkAction(NoteBase, generic.FormView):
+    """Действие над выбранными заметками списка одним запросом.
+
+    Каждое действие — запрос к множеству заметок автора, а не цикл
+    по отдельным заметкам.
+    """
+    query_budget = 20
+    form_class = NoteBulkForm
+    http_method_names = ('post',)
+
+    def get_list_url(self, tags):
+        url = reverse('notes:list')
+        if tags:
+            url += '?' + urlencode({'tag': tags}, doseq=True)
+        return url
+
+    def get_notes(self, form):
+        notes = self.get_queryset()
+        if form.cleaned_data['all_notes']:
+            return notes.with_tags(
+                form.cleaned_data['tag'], self.request.user
+            )
+        return notes.filter(pk__in=form.cleaned_data['notes'])
+
+    def form_valid(self, form):
+        notes = self.get_notes(form)
+        action = form.cleaned_data['action']
+        if action == form.EXPORT:
+            return self.export(form, notes)
+        with transaction.atomic():
+            if action == form.DELETE:
+                count = notes.soft_delete()
+                message = f'Перемещено в корзину заметок: {count}'
+            else:
+                count = notes.add_tags(form.cleaned_data['tags'])
+                message = f'Теги добавлены к заметкам: {count}'
+        messages.success(self.request, message)
+        return HttpResponseRedirect(
+            self.get_list_url(form.cleaned_data['tag'])
+        )
+
+    def export(self, form, notes):
+        """Ставит выгрузку в очередь: файл готовит фоновая задача."""
+        if form.cleaned_data['all_notes']:
+            payload = {'tags': form.cleaned_data['tag']}
+        else:
+            payload = {'notes': sorted(notes.values_list('pk', flat=True))}
+        job = jobs.enqueue('export_notes', author=self.request.user, **payload)
+        messages.success(
+            self.request,
+            'Выгрузка поставлена в очередь, файл будет доступен по адресу '
+            + reverse('notes:job_download', args=(job.pk,)),
+        )
+        return HttpResponseRedirect(
+            self.get_list_url(form.cleaned_data['tag'])
+        )
+
+    def form_invalid(self, form):
+        for errors in form.errors.values():
+            for error in errors:
+                messages.error(self.request, error)
+        return HttpResponseRedirect(
+            self.get_list_url(form.cleaned_data.get('tag'))
+        )
+
+
+@method_decorator(throttle('notes_write'), name='dispatch')
+class NoteImport(LoginRequiredMixin, generic.FormView):
+    """Загрузка файла экспорта; заметки восстанавливает фоновая задача."""
+    query_budget = 8
+    form_class = NoteImportForm
+    http_method_names = ('post',)
+
+    def form_valid(self, form):
+        path = backups.save_import(form.cleaned_data['file'])
+        job = jobs.enqueue(
+            'import_notes',
+            author=self.request.user,
+            path=str(path),
+            replace=form.cleaned_data['replace'],
+        )
+        messages.success(
+            self.request,
+            f'Импорт поставлен в очередь, состояние: '
+            f'{reverse("notes:job", args=(job.pk,))}',
+        )
+        return HttpResponseRedirect(reverse('notes:list'))
+
+    def form_invalid(self, form):
+        for errors in form.errors.values():
+            for error in errors:
+                messages.error(self.request, error)
+        return HttpResponseRedirect(reverse('notes:list'))
+
+
+class NoteDetail(NoteBase, streaming.StreamingRenderMixin,
+                 generic.DetailView):
+    """Заметка подробно; очень длинный текст отдаётся потоком."""
+    query_budget = 10
     template_name = 'notes/detail.html'
+
+    def render_to_response(self, context, **response_kwargs):
+        text = self.object.text
+        if len(text) < settings.NOTES_STREAM_MIN_TEXT:
+            return super().render_to_response(context, **response_kwargs)
+        return self.render_streaming(context, streaming.text_chunks(text))
+
+
+@method_decorator(throttle('notes_write'), name='dispatch')
+class NoteShare(NoteBase, SingleObjectMixin, generic.View):
+    """Открытие и закрытие публичной ссылки на заметку."""
+    query_budget = 8
+    http_method_names = ('post',)
+
+    def post(self, request, *args, **kwargs):
+        note = self.get_object()
+        if request.POST.get('revoke'):
+            note.unshare()
+        else:
+            note.share()
+        return HttpResponseRedirect(reverse('notes:detail', args=(note.slug,)))
+
+
+class SharedNote(generic.View):
+    """Публичная страница заметки из готового снимка.
+
+    Не обращается ни к БД, ни к сессии и пользователю запроса, поэтому
+    наплыв читателей по ссылке не нагружает базу.
+    """
+    query_budget = 0
+    http_method_names = ('get', 'head')
+
+    def get(self, request, token):
+        try:
+            snapshot, etag, last_modified = sharing.open_snapshot(token)
+        except FileNotFoundError:
+            # Не Http404: страница 404 сайта читает пользователя из сессии.
+            return HttpResponseNotFound('Ссылка не найдена или закрыта')
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = FileResponse(
+                snapshot, content_type='text/html; charset=utf-8'
+            )
+        else:
+            snapshot.close()
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        patch_cache_control(
+            response, public=True, max_age=settings.NOTES_SHARE_MAX_AGE
+        )
+        return response
+
+
+class NoteDuplicates(NoteBase, generic.DetailView):
+    """Заметки, почти совпадающие с выбранной."""
+    query_budget = 8
+    template_name = 'notes/duplicates.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['duplicates'] = self.get_queryset().near_duplicates(
+            self.object
+        )
+        return context
+
+
+class NoteAutocomplete(NoteBase, generic.View):
+    """Подсказки заголовков по префиксу для поля быстрого перехода."""
+    query_budget = 5
+    limit = 10
+    max_age = 30
+
+    def get(self, request, *args, **kwargs):
+        prefix = request.GET.get('q', '').strip()
+        results = []
+        if prefix:
+            results = list(
+                self.get_queryset().title_prefix(prefix).values(
+                    'title', 'slug'
+                )[:self.limit]
+            )
+        response = JsonResponse({'results': results})
+        patch_cache_control(response, private=True, max_age=self.max_age)
+        return response
+
+
+class AttachmentBase(NoteBase, SingleObjectMixin, generic.View):
+    """Вложения доступны только через заметки пользователя."""
+    pk_url_kwarg = 'note_pk'
+
+    def get_upload(self):
+        return get_object_or_404(
+            Upload.objects.select_related('note'),
+            pk=self.kwargs['upload_id'],
+            note=self.get_object(),
+        )
+
+    def upload_url(self, upload):
+        return reverse(
+            'notes:attachment_chunk', args=(upload.note.slug, upload.pk)
+        )
+
+
+@method_decorator(throttle('notes_write'), name='dispatch')
+class AttachmentUploadStart(AttachmentBase):
+    """Начало докачиваемой загрузки: имя, размер и тип файла."""
+    query_budget = 8
+
+    def post(self, request, *args, **kwargs):
+        note = self.get_object()
+        name = request.POST.get('name', '').strip()
+        try:
+            size = int(request.POST.get('size', ''))
+        except ValueError:
+            size = -1
+        max_size = settings.NOTES_ATTACHMENT_MAX_SIZE
+        if not name or not 0 <= size <= max_size:
+            return JsonResponse(
+                {'error': f'Нужны имя и размер файла до {max_size} байт'},
+                status=HTTPStatus.BAD_REQUEST,
+            )
+        upload = Upload.objects.create(
+            note=note,
+            name=name[:Upload._meta.get_field('name').max_length],
+            content_type=request.POST.get('content_type')
+            or 'application/octet-stream',
+            size=size,
+        )
+        return JsonResponse(
+            {'id': upload.pk, 'offset': 0, 'url': self.upload_url(upload)},
+            status=HTTPStatus.CREATED,
+        )
+
+
+class AttachmentUploadChunk(AttachmentBase):
+    """Приём частей загрузки: PUT с Content-Range, GET — текущее смещение."""
+    query_budget = 20
+
+    def get(self, request, *args, **kwargs):
+        upload = self.get_upload()
+        return JsonResponse({'offset': upload.received, 'size': upload.size})
+
+    def put(self, request, *args, **kwargs):
+        upload = self.get_upload()
+        content_range = request.headers.get('Content-Range', 'bytes 0-')
+        try:
+            offset = int(content_range.removeprefix('bytes ').split('-')[0])
+            length = int(request.headers.get('Content-Length') or 0)
+        except ValueError:
+            return JsonResponse(
+                {'error': 'Неверный Content-Range или Content-Length'},
+                status=HTTPStatus.BAD_REQUEST,
+            )
+        try:
+            received = attachments.write_chunk(upload, offset, request, length)
+        except attachments.UploadError as error:
+            return JsonResponse(
+                {'error': str(error), 'offset': error.offset},
+                status=HTTPStatus.CONFLICT,
+            )
+        if received < upload.size:
+            return JsonResponse({'offset': received})
+        attachment = attachments.complete(upload)
+        return JsonResponse(
+            {
+                'attachment': attachment.pk,
+                'url': reverse(
+                    'notes:attachment',
+                    args=(attachment.note.slug, attachment.pk),
+                ),
+            },
+            status=HTTPStatus.CREATED,
+        )
+
+
+class AttachmentDownload(AttachmentBase):
+    """Отдача вложения потоком с поддержкой Range и условных запросов."""
+    query_budget = 6
+
+    def get(self, request, *args, **kwargs):
+        attachment = get_object_or_404(
+            self.get_object().attachments.select_related('blob'),
+            pk=self.kwargs['pk'],
+        )
+        blob = attachment.blob
+        etag = f'"{blob.sha256}"'
+        last_modified = int(blob.created_at.timestamp())
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = self.file_response(attachment, etag)
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        response['Accept-Ranges'] = 'bytes'
+        patch_cache_control(response, private=True, max_age=86400)
+        return response
+
+    def file_response(self, attachment, etag):
+        blob = attachment.blob
+        header = settings.NOTES_SENDFILE_HEADER
+        if header:
+            # Файл и диапазоны отдаёт веб-сервер, воркер свободен сразу.
+            response = HttpResponse(content_type=attachment.content_type)
+            response[header] = settings.NOTES_SENDFILE_PREFIX + (
+                blob.relative_path
+            )
+            response['Content-Disposition'] = content_disposition_header(
+                True, attachment.name
+            )
+            return response
+        byte_range = None
+        if self.request.headers.get('If-Range', etag) == etag:
+            try:
+                byte_range = attachments.parse_range(
+                    self.request.headers.get('Range'), blob.size
+                )
+            except ValueError:
+                response = HttpResponse(
+                    status=HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE
+                )
+                response['Content-Range'] = f'bytes */{blob.size}'
+                return response
+        file = open(blob.path, 'rb')
+        if byte_range is None:
+            return FileResponse(
+                file,
+                as_attachment=True,
+                filename=attachment.name,
+                content_type=attachment.content_type,
+            )
+        start, end = byte_range
+        response = FileResponse(
+            attachments.FileRange(file, start, end - start + 1),
+            status=HTTPStatus.PARTIAL_CONTENT,
+            as_attachment=True,
+            filename=attachment.name,
+            content_type=attachment.content_type,
+        )
+        response['Content-Length'] = str(end - start + 1)
+        response['Content-Range'] = f'bytes {start}-{end}/{blob.size}'
+        return response
+
+
+class JobStatus(LoginRequiredMixin, generic.DetailView):
+    """Состояние фоновой задачи пользователя в JSON."""
+    query_budget = 5
+
+    def get_queryset(self):
+        return Job.objects.filter(author=self.request.user)
+
+    def render_to_response(self, context, **response_kwargs):
+        job = self.object
+        return JsonResponse({
+            'id': job.pk,
+            'kind': job.kind,
+            'status': job.status,
+            'attempts': job.attempts,
+            'progress': {
+                'done': job.progress_done,
+                'total': job.progress_total,
+            },
+            'result': job.result,
+            'error': job.error if job.status == Job.Status.FAILED else '',
+            'updated_at': job.updated_at,
+        })
+
+
+class JobDownload(LoginRequiredMixin, SingleObjectMixin, generic.View):
+    """Скачивание файла, подготовленного фоновой выгрузкой."""
+    query_budget = 5
+
+    def get_queryset(self):
+        return Job.objects.filter(
+            author=self.request.user,
+            kind='export_notes',
+            status=Job.Status.DONE,
+        )
+
+    def get(self, request, *args, **kwargs):
+        job = self.get_object()
+        try:
+            file = open(backups.export_path(job.pk), 'rb')
+        except FileNotFoundError:
+            raise Http404('Файл выгрузки не найден')
+        return FileResponse(
+            file,
+            as_attachment=True,
+            filename='notes.jsonl',
+            content_type='application/x-ndjson; charset=utf-8',
+        )
+
+
+@method_decorator(staff_member_required, name='dispatch')
+class MemoryReport(generic.View):
+    """Сводка профилирования памяти по маршрутам, только для персонала."""
+    query_budget = 4
+
+    def get(self, request, *args, **kwargs):
+        try:
+            top = int(request.GET.get('top', memory.TOP_SITES))
+        except ValueError:
+            top = memory.TOP_SITES
+        return JsonResponse({
+            'enabled': settings.NOTES_MEMORY_PROFILING,
+            'routes': memory.report(top=top),
+        })
@@ -0,0 +1,27 @@
+"""Окружение Jinja2 для шаблонов из templates_jinja2/."""
+from django.template.defaultfilters import date
+from django.templatetags.static import static
+from django.urls import reverse
+from django.utils.timezone import template_localtime
+
+from jinja2 import Environment
+
+
+def url(viewname, *args, **kwargs):
+    """Аналог тега {% url %}."""
+    return reverse(viewname, args=args or None, kwargs=kwargs or None)
+
+
+def localdate(value, format_string=None):
+    """Аналог фильтра date с переводом в текущий часовой пояс."""
+    return date(template_localtime(value), format_string)
+
+
+def environment(**options):
+    env = Environment(**options)
+    env.globals.update({
+        'static': static,
+        'url': url,
+    })
+    env.filters['date'] = localdate
+    return env
@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 from django.urls import reverse_lazy
@@ -12,7 +13,9 @@ ALLOWED_HOSTS = ['*']
 
 
 INSTALLED_APPS = [
-    'django.contrib.admin',
+    # Админка регистрируется в yanote/urls.py при первой загрузке URLconf,
+    # а не при старте воркера.
+    'django.contrib.admin.apps.SimpleAdminConfig',
     'django.contrib.auth',
     'django.contrib.contenttypes',
     'django.contrib.sessions',
@@ -23,6 +26,9 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'notes.memory.MemoryProfilingMiddleware',
+    'notes.middleware.CompressionMiddleware',
+    'notes.query_budget.QueryBudgetMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -33,22 +39,41 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'yanote.urls'
 
-TEMPLATES = [
-    {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
-        'DIRS': [BASE_DIR / 'templates'],
-        'APP_DIRS': True,
-        'OPTIONS': {
-            'context_processors': [
-                'django.template.context_processors.debug',
-                'django.template.context_processors.request',
-                'django.contrib.auth.context_processors.auth',
-                'django.contrib.messages.context_processors.messages',
-            ],
-        },
-    },
+TEMPLATE_CONTEXT_PROCESSORS = [
+    'django.template.context_processors.debug',
+    'django.template.context_processors.request',
+    'django.contrib.auth.context_processors.auth',
+    'django.contrib.messages.context_processors.messages',
+    'notes.context_processors.note_stats',
 ]
 
+DJANGO_TEMPLATES = {
+    'BACKEND': 'django.template.backends.django.DjangoTemplates',
+    'DIRS': [BASE_DIR / 'templates'],
+    'APP_DIRS': True,
+    'OPTIONS': {
+        'context_processors': TEMPLATE_CONTEXT_PROCESSORS,
+    },
+}
+
+JINJA2_TEMPLATES = {
+    'BACKEND': 'django.template.backends.jinja2.Jinja2',
+    'DIRS': [BASE_DIR / 'templates_jinja2'],
+    'APP_DIRS': False,
+    'OPTIONS': {
+        'environment': 'yanote.jinja2.environment',
+        'context_processors': TEMPLATE_CONTEXT_PROCESSORS,
+    },
+}
+
+# 'jinja2' — шаблоны заметок рендерит Jinja2, остальные (админка,
+# регистрация) по-прежнему находит движок Django.
+TEMPLATE_ENGINE = os.environ.get('YANOTE_TEMPLATE_ENGINE', 'django')
+
+TEMPLATES = [DJANGO_TEMPLATES]
+if TEMPLATE_ENGINE == 'jinja2':
+    TEMPLATES.insert(0, JINJA2_TEMPLATES)
+
 WSGI_APPLICATION = 'yanote.wsgi.application'
 
 
@@ -87,3 +112,56 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 LOGIN_URL = reverse_lazy('users:login')
 LOGIN_REDIRECT_URL = reverse_lazy('notes:home')
+
+NOTES_ATTACHMENTS_ROOT = BASE_DIR / 'attachments'
+NOTES_ATTACHMENT_MAX_SIZE = 1024 ** 3
+# Заголовок для отдачи файлов веб-сервером ('X-Accel-Redirect' для nginx,
+# 'X-Sendfile' для Apache) и внутренний префикс, под которым он видит
+# NOTES_ATTACHMENTS_ROOT / 'blobs'. None — файлы отдаёт Django.
+NOTES_SENDFILE_HEADER = None
+NOTES_SENDFILE_PREFIX = '/protected/blobs/'
+# Незавершённые загрузки старше стольких дней удаляет clean_attachments.
+NOTES_UPLOAD_EXPIRE_DAYS = 7
+
+NOTES_TRASH_RETENTION_DAYS = 30
+
+# Фоновые задачи: первая задержка повтора и её предел в секундах, срок
+# аренды задачи обработчиком и пауза при пустой очереди.
+NOTES_JOB_BACKOFF_BASE = 10
+NOTES_JOB_BACKOFF_MAX = 3600
+NOTES_JOB_LEASE = 600
+NOTES_JOB_POLL_INTERVAL = 1
+
+NOTES_PAGE_SIZE = 100
+# Заметки длиннее стольких символов отдаются потоком.
+NOTES_STREAM_MIN_TEXT = 64 * 1024
+NOTES_GZIP_MIN_LENGTH = 1024
+
+# Выборочное профилирование памяти; включается на отдельных воркерах.
+NOTES_MEMORY_PROFILING = os.environ.get('YANOTE_MEMORY_PROFILING') == '1'
+NOTES_MEMORY_SAMPLE_RATE = 0.01
+# Наибольшая доля времени процесса на профилируемые запросы.
+NOTES_MEMORY_OVERHEAD = 0.02
+NOTES_MEMORY_DIR = BASE_DIR / 'memory'
+
+# Бюджет SQL-запросов представлений без собственного query_budget
+# и допустимое число повторов запроса одной формы.
+NOTES_QUERY_BUDGET_DEFAULT = 30
+NOTES_QUERY_REPEAT_LIMIT = 10
+# True — нарушение бюджета выбрасывает исключение (в тестах).
+NOTES_QUERY_BUDGET_RAISE = False
+
+# Снимки публичных страниц заметок. Веб-сервер может отдавать
+# /share/<token>/ прямо из файлов <token>.html этого каталога.
+NOTES_SHARE_ROOT = BASE_DIR / 'shared'
+NOTES_SHARE_MAX_AGE = 60
+
+NOTES_BACKUP_DIR = BASE_DIR / 'backups'
+NOTES_BACKUP_KEEP = 7
+# Файлы фоновых выгрузок и загруженные файлы импорта.
+NOTES_EXPORT_DIR = BASE_DIR / 'exports'
+
+NOTES_THROTTLE_RATES = {
+    'notes_write': {'user': '60/m', 'ip': '300/m'},
+    'signup': {'ip': '10/h'},
+}
@@ -4,6 +4,11 @@ from django.contrib.auth.forms import UserCreationForm
 from django.urls import include, path
 from django.views.generic import CreateView
 
+from notes.query_budget import query_budget
+from notes.throttling import throttle
+
+admin.autodiscover()
+
 urlpatterns = [
     path('', include('notes.urls')),
     path('admin/', admin.site.urls),
@@ -24,11 +29,11 @@ auth_urls = ([
     ),
     path(
         'signup/',
-        CreateView.as_view(
+        query_budget(10)(throttle('signup')(CreateView.as_view(
             form_class=UserCreationForm,
             success_url='/',
             template_name='registration/signup.html',
-        ),
+        ))),
         name='signup'
     ),
 ], 'users')